@@ -0,0 +1,193 @@
+"""
+Performance benchmarks for gym_conservation.
+
+    python -m gym_conservation.benchmark run -o bench.json
+    python -m gym_conservation.benchmark compare base.json bench.json
+
+`run` measures env step() throughput for every registered id,
+VectorEcologyEnv and BatchEcologyEnv throughput against the number of
+replicates, simulate_mdp / estimate_policyfn times and (unless --no-train)
+PPO / A2C training throughput, and saves them as JSON.  `compare` flags
+every measurement that got worse by more than --threshold.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+import gym
+import numpy as np
+
+import gym_conservation
+from gym_conservation.envs.batch_env import BatchEcologyEnv
+from gym_conservation.models.policies import fixed_action
+
+ENV_IDS = [
+    "conservation-v0",
+    "conservation-v2",
+    "conservation-v3",
+    "conservation-v5",
+    "conservation-v6",
+    "conservation-v7",
+]
+
+
+def best_time(f, repeat=3):
+    """
+    Best wall-clock time of `repeat` calls of f().
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def step_throughput(env_id, n_steps=10000, repeat=3, **kwargs):
+    env = gym.make(env_id, file=None, **kwargs).unwrapped
+    action = np.zeros(env.action_space.shape, dtype=np.float32)
+
+    def run():
+        env.reset()
+        for _ in range(n_steps):
+            if env.step(action)[2]:
+                env.reset()
+
+    return n_steps / best_time(run, repeat)
+
+
+def batch_throughput(env_id, n_envs, n_steps=1000, repeat=3):
+    env = BatchEcologyEnv(env_id, n_envs=n_envs, seed=0)
+    action = np.zeros(n_envs)
+
+    def run():
+        env.reset()
+        for _ in range(n_steps):
+            env.step(action)
+
+    return n_envs * n_steps / best_time(run, repeat)
+
+
+def train_throughput(algo, env_id, timesteps=2048):
+    import stable_baselines3
+
+    env = gym.make(env_id, file=None)
+    model = getattr(stable_baselines3, algo)("MlpPolicy", env, verbose=0)
+    return timesteps / best_time(lambda: model.learn(timesteps), repeat=1)
+
+
+def run_benchmarks(
+    quick=False, reps=(1, 10, 100, 1000, 10000), train=True, repeat=3
+):
+    """
+    Run the suite; returns a list of measurement dicts with keys name,
+    value, unit and better ("higher" or "lower").
+    """
+    n_steps = 500 if quick else 10000
+    results = []
+
+    def record(name, value, unit, better="higher"):
+        results.append(
+            dict(name=name, value=float(value), unit=unit, better=better)
+        )
+
+    for env_id in ENV_IDS:
+        rate = step_throughput(env_id, n_steps, repeat)
+        record("step/" + env_id, rate, "steps/s")
+
+    for n in reps:
+        steps = max(n_steps // n, 10)
+        rate = step_throughput("conservation-v7", steps, repeat, reps=n)
+        record("vector_env/reps={}".format(n), rate * n, "rep-steps/s")
+        rate = batch_throughput("conservation-v6", n, steps, repeat)
+        record("batch_env/reps={}".format(n), rate, "rep-steps/s")
+
+    env = gym.make("conservation-v6", file=None)
+    model = fixed_action(env, 0.3)
+    sim_reps = 2 if quick else 10
+    for batch in (False, True):
+        label = "simulate_mdp_batch" if batch else "simulate_mdp"
+        t = best_time(lambda: env.simulate(model, sim_reps, batch), repeat)
+        record("{}/reps={}".format(label, sim_reps), t, "s", "lower")
+    t = best_time(lambda: env.policyfn(model, reps=10), repeat)
+    record("estimate_policyfn/reps=10", t, "s", "lower")
+
+    if train:
+        timesteps = 256 if quick else 2048
+        for algo in ("PPO", "A2C"):
+            rate = train_throughput(algo, "conservation-v6", timesteps)
+            record("train/{}".format(algo), rate, "timesteps/s")
+    return results
+
+
+def save_results(results, path):
+    meta = dict(
+        time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        python=platform.python_version(),
+        numpy=np.__version__,
+        platform=platform.platform(),
+        processor=platform.processor(),
+    )
+    with open(path, "w") as f:
+        json.dump(dict(meta=meta, results=results), f, indent=1)
+
+
+def compare(base, new, threshold=0.1):
+    """
+    Compare two saved runs. Returns the names of measurements that are
+    more than `threshold` (relative) worse in `new` than in `base`.
+    """
+    with open(base) as f:
+        base = {r["name"]: r for r in json.load(f)["results"]}
+    with open(new) as f:
+        new = {r["name"]: r for r in json.load(f)["results"]}
+
+    regressions = []
+    print("{:<36} {:>12} {:>12} {:>8}".format("name", "base", "new", "ratio"))
+    for name, r in new.items():
+        if name not in base:
+            continue
+        ratio = r["value"] / base[name]["value"]
+        worse = 1 / ratio if r["better"] == "higher" else ratio
+        flag = ""
+        if worse > 1 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            "{:<36} {:>12.4g} {:>12.4g} {:>8.2f}{}".format(
+                name, base[name]["value"], r["value"], ratio, flag
+            )
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m gym_conservation.benchmark"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="run the benchmarks")
+    run.add_argument("-o", "--output", default="benchmark.json")
+    run.add_argument("--quick", action="store_true")
+    run.add_argument("--no-train", action="store_true")
+    cmp = sub.add_parser("compare", help="compare two benchmark runs")
+    cmp.add_argument("base")
+    cmp.add_argument("new")
+    cmp.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_benchmarks(quick=args.quick, train=not args.no_train)
+        save_results(results, args.output)
+        for r in results:
+            print("{name:<36} {value:>12.4g} {unit}".format(**r))
+        return 0
+    regressions = compare(args.base, args.new, args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
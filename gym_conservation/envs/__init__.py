@@ -1,3 +1,5 @@
 from gym_conservation.envs.growth_models import *
 from gym_conservation.envs.nonstationary import *
 from gym_conservation.envs.vector_env import *
+from gym_conservation.envs.batch_env import *
+from gym_conservation.envs.model_posterior import *
@@ -1,13 +1,26 @@
+import math
+
 import gym
 import numpy as np
 from gym import spaces
 
+from gym_conservation.envs.instrument import instrument_env
+from gym_conservation.envs.noise import NoiseStream
+from gym_conservation.envs.params import (
+    EcologyParams,
+    EcologyState,
+    EnvSnapshot,
+    as_params,
+)
+from gym_conservation.envs.recorder import TrajectoryRecorder
 from gym_conservation.envs.shared_env import (
-    csv_entry,
+    estimate_policy_surface,
     estimate_policyfn,
     plot_mdp,
     plot_policyfn,
+    render_entry,
     simulate_mdp,
+    simulate_mdp_batch,
 )
 
 
@@ -16,41 +29,37 @@ class BaseEcologyEnv(gym.Env):
 
     def __init__(
         self,
-        params={
-            "r": 0.3,
-            "K": 1,
-            "sigma": 0.0,
-            "x0": 0.1,
-            "cost": 2.0,
-            "benefit": 1.0,
-        },
+        params=None,
         Tmax=500,
         file="render.csv",
     ):
 
-        # parameters
-        self.K = params["K"]
-        self.r = params["r"]
-        self.sigma = params["sigma"]
-        self.cost = params["cost"]
-        self.benefit = params["benefit"]
-        self.init_state = params["x0"]
+        # parameters, as a frozen record (a plain dict is converted)
+        if params is None:
+            params = EcologyParams(
+                r=0.3, K=1, sigma=0.0, x0=0.1, cost=2.0, benefit=1.0
+            )
+        else:
+            params = as_params(params)
         self.params = params
 
-        # Preserve these for reset
-        self.unscaled_state = self.init_state
+        # per-instance dynamic state: population, year and drifting `a`
+        self.dynamic = EcologyState(
+            float(params["x0"]), 0, params.get("a", float("nan"))
+        )
         self.reward = 0
         self.unscaled_action = 0
-        self.years_passed = 0
         self.Tmax = Tmax
         self.file = file
+        # unseeded until seed() is called
+        self.noise = NoiseStream()
 
-        # for render() method only
+        # for render() method only; nothing is opened until first flush
+        self.recorder = None
         if file is not None:
-            self.write_obj = open(file, "w+")
-
-        # Initial state
-        self.state = np.array([self.init_state / self.K - 1])
+            self.recorder = TrajectoryRecorder(
+                file, ["time", "state", "action", "reward"]
+            )
 
         # Best if cts actions / observations are normalized to a [-1, 1] domain
         self.action_space = spaces.Box(
@@ -63,6 +72,77 @@ class BaseEcologyEnv(gym.Env):
             np.array([1], dtype=np.float32),
             dtype=np.float32,
         )
+        self.precompute()
+
+        # Initial state; the observation is kept in a preallocated buffer
+        self._obs = np.empty(1)
+        self.state = self._obs
+        self.get_state(self.init_state)
+
+    @property
+    def unscaled_state(self):
+        return self.dynamic.x
+
+    @unscaled_state.setter
+    def unscaled_state(self, x):
+        self.dynamic.x = x
+
+    @property
+    def years_passed(self):
+        return self.dynamic.years_passed
+
+    @years_passed.setter
+    def years_passed(self, t):
+        self.dynamic.years_passed = t
+
+    @property
+    def a(self):
+        """
+        current value of the (possibly drifting) parameter `a`
+        """
+        return self.dynamic.a
+
+    def precompute(self):
+        """
+        Cache the constants used by step() as plain floats, so that the
+        scalar dynamics never touch numpy or the `params` dict for them.
+        Called at construction and on every reset(), so a new `params`
+        record (e.g. `env.params = env.params.replace(sigma=0.1)`) or new
+        spaces take effect from the next episode.
+        """
+        self.K = self.params["K"]
+        self.r = self.params["r"]
+        self.sigma = self.params["sigma"]
+        self.cost = self.params["cost"]
+        self.benefit = self.params["benefit"]
+        self.init_state = self.params["x0"]
+        self._K = float(self.K)
+        self._r = float(self.params["r"])
+        self._sigma = float(self.params["sigma"])
+        self._cost = float(self.params["cost"])
+        self._benefit = float(self.params["benefit"])
+        self._discrete = isinstance(self.action_space, gym.spaces.Discrete)
+        if not self._discrete:
+            self._low = float(self.action_space.low[0])
+            self._high = float(self.action_space.high[0])
+
+    @property
+    def deterministic(self):
+        """
+        True when the dynamics draw no noise (sigma == 0), so that every
+        episode of a deterministic policy is the same.
+        """
+        return not self._sigma
+
+    def seed(self, seed=None, block_size=None):
+        """
+        Seed the env's own random number generator. Noise is drawn in
+        blocks of `block_size` (default: unchanged) normals at a time.
+        """
+        if block_size is None:
+            block_size = self.noise.block_size
+        self.noise = NoiseStream(seed, block_size)
+        return [seed]
 
     def step(self, action):
 
@@ -84,39 +164,85 @@ class BaseEcologyEnv(gym.Env):
 
         if self.unscaled_state <= 0.0:
             done = True
-        return self.state[0], self.reward[0], done, {}
+        return self.state.copy(), self.reward, done, {}
 
     def reset(self):
-        self.state = np.array([self.init_state / self.K - 1])
-        self.unscaled_state = self.init_state
+        self.precompute()
+        self.unscaled_state = float(self.init_state)
+        self.dynamic.a = self.params.get("a", float("nan"))
+        self.get_state(self.unscaled_state)
         self.years_passed = 0
 
         # for tracking only
         self.reward = 0
         self.unscaled_action = 0
-        return self.state
+        return self.state.copy()
+
+    def get_snapshot(self, noise=True):
+        """
+        Cheap copy of the env's current state, to `restore()` later, e.g.
+        to try several actions from the same point.  With `noise=False`
+        the noise stream is left out, so that restored futures keep drawing
+        fresh noise instead of repeating the same draws.
+        """
+        return EnvSnapshot(
+            self.params,
+            self.dynamic.copy(),
+            self.reward,
+            self.unscaled_action,
+            self.noise.get_state() if noise else None,
+        )
+
+    def restore(self, snapshot):
+        """
+        Return to the state saved by `get_snapshot()`; returns the
+        observation.
+        """
+        if snapshot.params is not self.params:
+            self.params = snapshot.params
+            self.precompute()
+        self.dynamic = snapshot.dynamic.copy()
+        self.reward = snapshot.reward
+        self.unscaled_action = snapshot.unscaled_action
+        if snapshot.noise is not None:
+            self.noise.set_state(snapshot.noise)
+        self.get_state(self.unscaled_state)
+        return self.state.copy()
 
     def compute_reward(self):
-        return self.benefit * self.unscaled_state - np.power(
-            self.unscaled_action, self.cost
+        return (
+            self._benefit * self.unscaled_state
+            - self.unscaled_action**self._cost
         )
 
+    def instrument(self, enabled=True, allocations=False):
+        """
+        Opt-in per-phase profiling of step(); returns the StepProfiler
+        whose summary() / report() hold the counters.
+        """
+        return instrument_env(self, enabled, allocations)
+
     def render(self, mode="human"):
-        return csv_entry(self)
+        return render_entry(self)
 
     def close(self):
-        if self.file is not None:
-            self.write_obj.close()
+        if self.recorder is not None:
+            self.recorder.close()
 
-    def simulate(env, model, reps=1):
+    def simulate(env, model, reps=1, batch=False):
+        if batch:
+            return simulate_mdp_batch(env, model, reps)
         return simulate_mdp(env, model, reps)
 
-    def plot(self, df, output="results.png"):
-        return plot_mdp(self, df, output)
+    def plot(self, df, output="results.png", **kwargs):
+        return plot_mdp(self, df, output, **kwargs)
 
     def policyfn(env, model, reps=1):
         return estimate_policyfn(env, model, reps)
 
+    def policy_surface(env, model, grids=None, n=50):
+        return estimate_policy_surface(env, model, grids, n)
+
     def plot_policy(self, df, output="results.png"):
         return plot_policyfn(self, df, output)
 
@@ -129,43 +255,76 @@ class BaseEcologyEnv(gym.Env):
         return self.unscaled_action
 
     def population_draw(self):
-        self.unscaled_state = (
-            self.unscaled_state
-            + self.r
-            * self.unscaled_state
-            * (1.0 - self.unscaled_state / self.K)
-            + self.unscaled_state * self.sigma * np.random.normal(0, 1)
-        )
-        self.unscaled_state = np.clip(self.unscaled_state, 0, 2 * self.K)
+        x = self.unscaled_state
+        x = x + self._r * x * (1.0 - x / self._K)
+        if self._sigma:
+            x = x + x * self._sigma * self.noise.normal()
+        self.unscaled_state = min(max(x, 0.0), 2 * self._K)
         return self.unscaled_state
 
+    def growth_draw(self, x):
+        """
+        Lognormal growth step from the float state `x`, exp(mu + sigma z)
+        with mu = `self.growth_mu(x)`, the model's log-mean (only evaluated
+        for x > 0, a state of 0 stays extinct).  Takes one normal draw per
+        step, whatever the state, unless sigma is 0: deterministic envs step
+        in closed form without touching the noise stream.
+        """
+        if not self._sigma:
+            return math.exp(self.growth_mu(x)) if x > 0.0 else 0.0
+        z = self.noise.normal()
+        if x <= 0.0:
+            return 0.0
+        return math.exp(self.growth_mu(x) + self._sigma * z)
+
+    # Batched dynamics, used by BatchEcologyEnv to step many copies of the
+    # env at once. `x` is an array of unscaled states, `params` a dict of
+    # per-copy parameter arrays (which may be updated in place) and `rng`
+    # a np.random.Generator.
+    def batch_perform_action(self, x, unscaled_action, params):
+        return x + unscaled_action
+
+    def batch_population_draw(self, x, params, rng):
+        x = (
+            x
+            + params["r"] * x * (1.0 - x / params["K"])
+            + x * params["sigma"] * rng.standard_normal(np.shape(x))
+        )
+        return np.clip(x, 0, 2 * params["K"])
+
+    def batch_compute_reward(self, x, unscaled_action, params):
+        return params["benefit"] * x - np.power(
+            unscaled_action, params["cost"]
+        )
+
     def get_unscaled_action(self, action):
         """
         Convert action into unscaled_action
         """
-        if isinstance(self.action_space, gym.spaces.discrete.Discrete):
-            unscaled_action = (action / self.n_actions) * self.K
-        # Continuous Actions
-        else:
-            action = np.clip(
-                action, self.action_space.low, self.action_space.high
-            )[0]
-            unscaled_action = (action + 1) * self.K
-        return unscaled_action
+        if self._discrete:
+            return (action / self.n_actions) * self._K
+        # Continuous Actions, as a length-1 array or a scalar
+        try:
+            action = action[0]
+        except (TypeError, IndexError):
+            pass
+        action = min(max(float(action), self._low), self._high)
+        return (action + 1) * self._K
 
     def get_action(self, unscaled_action):
         """
         Convert unscaled_action into action
         """
-        if isinstance(self.action_space, gym.spaces.discrete.Discrete):
-            return round(unscaled_action * self.n_actions / self.K)
+        if self._discrete:
+            return round(unscaled_action * self.n_actions / self._K)
         else:
-            return unscaled_action / self.K - 1
+            return unscaled_action / self._K - 1
 
     def get_unscaled_state(self, state):
-        self.unscaled_state = (state[0] + 1) * self.K
+        self.unscaled_state = (float(state[0]) + 1) * self._K
         return self.unscaled_state
 
     def get_state(self, unscaled_state):
-        self.state = np.array([unscaled_state / self.K - 1])
+        self._obs[0] = unscaled_state / self._K - 1
+        self.state = self._obs
         return self.state
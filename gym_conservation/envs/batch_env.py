@@ -0,0 +1,135 @@
+from collections.abc import Mapping
+
+import gym
+import numpy as np
+
+
+class BatchEcologyEnv:
+    """
+    Steps `n_envs` independent copies of a scalar ecology env (any of the
+    envs in growth_models.py or nonstationary.py) with a single array
+    operation per phase.
+
+    State, years_passed, done flags and parameters of every copy are held
+    as NumPy arrays of length `n_envs`, and the env's `batch_*` methods
+    supply the dynamics. Copies that finish are reset automatically unless
+    `autoreset=False`, in which case they keep being stepped (as
+    `simulate_mdp` does) until `reset()` is called.
+    """
+
+    def __init__(self, env, n_envs=1, seed=None, autoreset=True, **env_kwargs):
+        if isinstance(env, str):
+            env = gym.make(env, file=None, **env_kwargs).unwrapped
+        if any(isinstance(v, Mapping) for v in env.params.values()):
+            raise ValueError("nested model parameters are not supported")
+
+        self.env = env
+        self.n_envs = n_envs
+        self.Tmax = env.Tmax
+        self.autoreset = autoreset
+        self.rng = np.random.default_rng(seed)
+
+        self.init_params = {
+            k: np.full(n_envs, v, dtype=np.float64)
+            for k, v in env.params.items()
+        }
+        self.params = {k: v.copy() for k, v in self.init_params.items()}
+        self.unscaled_state = self.params["x0"].copy()
+        self.unscaled_action = np.zeros(n_envs)
+        self.reward = np.zeros(n_envs)
+        self.years_passed = np.zeros(n_envs, dtype=np.int64)
+        self.done = np.zeros(n_envs, dtype=bool)
+        self.state = self.get_state(self.unscaled_state)
+
+    def seed(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+        return [seed]
+
+    def reset(self, mask=None):
+        """
+        Reset all copies, or only those selected by boolean `mask`.
+        """
+        if mask is None:
+            mask = np.ones(self.n_envs, dtype=bool)
+        for k, v in self.init_params.items():
+            self.params[k][mask] = v[mask]
+        self.unscaled_state[mask] = self.params["x0"][mask]
+        self.unscaled_action = np.where(mask, 0.0, self.unscaled_action)
+        self.reward = np.where(mask, 0.0, self.reward)
+        self.years_passed[mask] = 0
+        self.done = self.done & ~mask
+        self.state[mask] = self.get_state(self.unscaled_state)[mask]
+        return self.state
+
+    def restore(self, snapshot, mask=None):
+        """
+        Put every copy (or those selected by boolean `mask`) in the state
+        of a scalar env snapshot, from `env.get_snapshot()`, e.g. to branch
+        one state into many futures.  The copies keep this batch's own
+        random number generator; `reset()` still returns them to the
+        start of an episode.
+        """
+        if mask is None:
+            mask = np.ones(self.n_envs, dtype=bool)
+        for k, v in snapshot.params.items():
+            self.params[k][mask] = v
+        dynamic = snapshot.dynamic
+        if "a" in self.params:
+            self.params["a"][mask] = dynamic.a
+        self.unscaled_state[mask] = dynamic.x
+        self.unscaled_action = np.where(
+            mask, snapshot.unscaled_action, self.unscaled_action
+        )
+        self.reward = np.where(mask, snapshot.reward, self.reward)
+        self.years_passed[mask] = dynamic.years_passed
+        self.done = self.done & ~mask
+        self.state[mask] = self.get_state(self.unscaled_state)[mask]
+        return self.state
+
+    def step(self, action):
+        """
+        Step every copy with the scaled `action` array (one action per
+        copy, in [-1, 1]).
+        """
+        return self.step_unscaled(self.get_unscaled_action(action))
+
+    def step_unscaled(self, unscaled_action):
+        """
+        Step every copy with actions already on the [0, 2K] real scale.
+        Returns `(state, reward, done, info)` arrays; for copies that were
+        reset, `info["terminal_observation"]` holds their final state.
+        """
+        env = self.env
+        params = self.params
+        ua = np.broadcast_to(unscaled_action, (self.n_envs,))
+        x = self.get_unscaled_state(self.state)
+        x = env.batch_perform_action(x, ua, params)
+        x = env.batch_population_draw(x, params, self.rng)
+
+        self.unscaled_state = x
+        self.unscaled_action = np.array(ua, dtype=np.float64)
+        self.state = self.get_state(x)
+        self.reward = reward = env.batch_compute_reward(x, ua, params)
+        self.years_passed += 1
+        truncated = self.years_passed > self.Tmax
+        self.done = done = truncated | (x <= 0.0)
+
+        state = self.state
+        info = {"truncated": truncated & (x > 0.0)}
+        if self.autoreset and done.any():
+            info["terminal_observation"] = state.copy()
+            state = self.reset(done)
+        return state, reward, done, info
+
+    def get_unscaled_action(self, action):
+        action = np.reshape(action, (self.n_envs,))
+        return (np.clip(action, -1.0, 1.0) + 1) * self.params["K"]
+
+    def get_action(self, unscaled_action):
+        return unscaled_action / self.params["K"] - 1
+
+    def get_unscaled_state(self, state):
+        return (state + 1) * self.params["K"]
+
+    def get_state(self, unscaled_state):
+        return unscaled_state / self.params["K"] - 1
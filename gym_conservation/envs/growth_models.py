@@ -1,10 +1,21 @@
+import math
+
 import numpy as np
 from gym.envs.registration import register
 
 from gym_conservation.envs.base_env import BaseEcologyEnv
+from gym_conservation.envs.params import (
+    AllenParams,
+    EcologyParams,
+    MayParams,
+    MyersParams,
+    model_params,
+)
 
 
 class Allen(BaseEcologyEnv):
+    growth_model = "allen"
+
     def __init__(
         self,
         r=0.3,
@@ -18,25 +29,39 @@ class Allen(BaseEcologyEnv):
         file="render.csv",
     ):
         super().__init__(
-            params={
-                "r": r,
-                "K": K,
-                "sigma": sigma,
-                "C": C,
-                "x0": init_state,
-                "cost": cost,
-                "benefit": benefit,
-            },
+            params=AllenParams(
+                r=r,
+                K=K,
+                sigma=sigma,
+                C=C,
+                x0=init_state,
+                cost=cost,
+                benefit=benefit,
+            ),
             Tmax=Tmax,
             file=file,
         )
 
+    def precompute(self):
+        super().precompute()
+        self._C = float(self.params["C"])
+
     def population_draw(self):
-        self.unscaled_state = allen(self.unscaled_state, self.params)
+        self.unscaled_state = self.growth_draw(self.unscaled_state)
         return self.unscaled_state
 
+    def growth_mu(self, x):
+        return (
+            math.log(x) + self._r * (1 - x / self._K) * (1 - self._C) / self._K
+        )
+
+    def batch_population_draw(self, x, params, rng):
+        return allen_batch(x, params, rng)
+
 
 class BevertonHolt(BaseEcologyEnv):
+    growth_model = "beverton_holt"
+
     def __init__(
         self,
         r=0.3,
@@ -49,24 +74,39 @@ class BevertonHolt(BaseEcologyEnv):
         file="render.csv",
     ):
         super().__init__(
-            params={
-                "r": r,
-                "K": K,
-                "sigma": sigma,
-                "x0": init_state,
-                "cost": cost,
-                "benefit": benefit,
-            },
+            params=EcologyParams(
+                r=r,
+                K=K,
+                sigma=sigma,
+                x0=init_state,
+                cost=cost,
+                benefit=benefit,
+            ),
             Tmax=Tmax,
             file=file,
         )
 
+    def precompute(self):
+        super().precompute()
+        r = max(float(self.params["r"]), 0.0)
+        self._log_A = math.log(r + 1)
+        with np.errstate(divide="ignore"):
+            self._B = float(np.divide(max(self._K, 0.0), r))
+
     def population_draw(self):
-        self.unscaled_state = beverton_holt(self.unscaled_state, self.params)
+        self.unscaled_state = self.growth_draw(self.unscaled_state)
         return self.unscaled_state
 
+    def growth_mu(self, x):
+        return self._log_A + math.log(x) - math.log(1 + x / self._B)
+
+    def batch_population_draw(self, x, params, rng):
+        return beverton_holt_batch(x, params, rng)
+
 
 class Myers(BaseEcologyEnv):
+    growth_model = "myers"
+
     def __init__(
         self,
         r=1.0,
@@ -81,28 +121,47 @@ class Myers(BaseEcologyEnv):
         file="render.csv",
     ):
         super().__init__(
-            params={
-                "r": r,
-                "K": K,
-                "sigma": sigma,
-                "theta": theta,
-                "M": M,
-                "x0": init_state,
-                "cost": cost,
-                "benefit": benefit,
-            },
+            params=MyersParams(
+                r=r,
+                K=K,
+                sigma=sigma,
+                theta=theta,
+                M=M,
+                x0=init_state,
+                cost=cost,
+                benefit=benefit,
+            ),
             Tmax=Tmax,
             file=file,
         )
 
+    def precompute(self):
+        super().precompute()
+        self._log_A = math.log(self._r + 1)
+        self._theta = float(self.params["theta"])
+        self._M = float(self.params["M"])
+
     def population_draw(self):
-        self.unscaled_state = myers(self.unscaled_state, self.params)
+        self.unscaled_state = self.growth_draw(self.unscaled_state)
         return self.unscaled_state
 
+    def growth_mu(self, x):
+        theta = self._theta
+        return (
+            self._log_A
+            + theta * math.log(x)
+            - math.log(1 + x**theta / self._M)
+        )
+
+    def batch_population_draw(self, x, params, rng):
+        return myers_batch(x, params, rng)
+
 
 # (r =.7, M = 1.2, q = 3, b = 0.15, a = 0.2) # lower-state peak is optimal
 # (r =.7, M = 1.5, q = 3, b = 0.15, a = 0.2) # higher-state peak is optimal
 class May(BaseEcologyEnv):
+    growth_model = "may"
+
     def __init__(
         self,
         r=0.7,
@@ -119,28 +178,40 @@ class May(BaseEcologyEnv):
         file="render.csv",
     ):
         super().__init__(
-            params={
-                "r": r,
-                "K": K,
-                "sigma": sigma,
-                "q": q,
-                "b": b,
-                "a": a,
-                "M": M,
-                "x0": init_state,
-                "cost": cost,
-                "benefit": benefit,
-            },
+            params=MayParams(
+                r=r,
+                K=K,
+                sigma=sigma,
+                q=q,
+                b=b,
+                a=a,
+                M=M,
+                x0=init_state,
+                cost=cost,
+                benefit=benefit,
+            ),
             Tmax=Tmax,
             file=file,
         )
 
+    def precompute(self):
+        super().precompute()
+        self._may = may_constants(self.params)
+
     def population_draw(self):
-        self.unscaled_state = may(self.unscaled_state, self.params)
+        self.unscaled_state = self.growth_draw(self.unscaled_state)
         return self.unscaled_state
 
+    def growth_mu(self, x):
+        return may_mu_scalar(x, self.dynamic.a, *self._may)
+
+    def batch_population_draw(self, x, params, rng):
+        return may_batch(x, params, rng)
+
 
 class Ricker(BaseEcologyEnv):
+    growth_model = "ricker"
+
     def __init__(
         self,
         r=0.3,
@@ -153,76 +224,70 @@ class Ricker(BaseEcologyEnv):
         file="render.csv",
     ):
         super().__init__(
-            params={
-                "r": r,
-                "K": K,
-                "sigma": sigma,
-                "x0": init_state,
-                "cost": cost,
-                "benefit": benefit,
-            },
+            params=EcologyParams(
+                r=r,
+                K=K,
+                sigma=sigma,
+                x0=init_state,
+                cost=cost,
+                benefit=benefit,
+            ),
             Tmax=Tmax,
             file=file,
         )
 
     def population_draw(self):
-        self.unscaled_state = ricker(self.unscaled_state, self.params)
+        self.unscaled_state = self.growth_draw(self.unscaled_state)
         return self.unscaled_state
 
+    def growth_mu(self, x):
+        return math.log(x) + self._r * (1 - x / self._K)
+
+    def batch_population_draw(self, x, params, rng):
+        return ricker_batch(x, params, rng)
+
+
+# default candidates of ModelUncertainty
+MODEL_UNCERTAINTY_PARAMS = {
+    "allen": AllenParams(
+        r=0.3, K=1.0, sigma=0.0, C=0.5, x0=0.75, cost=1.0, benefit=5.0
+    ),
+    "beverton_holt": EcologyParams(
+        r=0.3, K=1, sigma=0.0, x0=0.75, cost=1.0, benefit=5.0
+    ),
+    "myers": MyersParams(
+        r=1.0,
+        K=1.0,
+        M=1.0,
+        theta=3.0,
+        sigma=0.0,
+        x0=1.5,
+        cost=1.0,
+        benefit=5.0,
+    ),
+    "may": MayParams(
+        r=0.7,
+        K=1.5,
+        M=1.5,
+        q=3,
+        b=0.15,
+        sigma=0.0,
+        a=0.2,
+        x0=0.1,
+        cost=1.0,
+        benefit=5.0,
+    ),
+    "ricker": EcologyParams(
+        r=0.3, K=1, sigma=0.0, x0=0.75, cost=1.0, benefit=5.0
+    ),
+}
+
 
 class ModelUncertainty(BaseEcologyEnv):
     def __init__(
         self,
-        models=["allen", "beverton_holt", "myers", "may", "ricker"],
-        params={
-            "allen": {
-                "r": 0.3,
-                "K": 1.0,
-                "sigma": 0.0,
-                "C": 0.5,
-                "x0": 0.75,
-                "cost": 1.0,
-                "benefit": 5.0,
-            },
-            "beverton_holt": {
-                "r": 0.3,
-                "K": 1,
-                "sigma": 0.0,
-                "x0": 0.75,
-                "cost": 1.0,
-                "benefit": 5.0,
-            },
-            "myers": {
-                "r": 1.0,
-                "K": 1.0,
-                "M": 1.0,
-                "theta": 3.0,
-                "sigma": 0.0,
-                "x0": 1.5,
-                "cost": 1.0,
-                "benefit": 5.0,
-            },
-            "may": {
-                "r": 0.7,
-                "K": 1.5,
-                "M": 1.5,
-                "q": 3,
-                "b": 0.15,
-                "sigma": 0.0,
-                "a": 0.2,
-                "x0": 0.1,
-                "cost": 1.0,
-                "benefit": 5.0,
-            },
-            "ricker": {
-                "r": 0.3,
-                "K": 1,
-                "sigma": 0.0,
-                "x0": 0.75,
-                "cost": 1.0,
-                "benefit": 5.0,
-            },
-        },
+        models=("allen", "beverton_holt", "myers", "may", "ricker"),
+        params=None,
         Tmax=100,
         file="render.csv",
     ):
@@ -230,28 +295,52 @@ class ModelUncertainty(BaseEcologyEnv):
             Tmax=Tmax,
             file=file,
         )
-        self.model = np.random.choice(models)
-        self.models = models
-        self.params = params
+        if params is None:
+            params = MODEL_UNCERTAINTY_PARAMS
+        self.models = list(models)
+        self.model = self.noise.choice(self.models)
+        self.params = {
+            m: p if isinstance(p, model_params[m]) else model_params[m](**p)
+            for m, p in params.items()
+        }
+
+    def precompute(self):
+        # scaling and reward constants keep BaseEcologyEnv's defaults, set
+        # before `params` is replaced by the per-model parameters
+        if "K" in self.params:
+            super().precompute()
+
+    @property
+    def deterministic(self):
+        # the hidden model is drawn at random each episode
+        return len(set(self.models)) == 1 and not any(
+            self.params[m]["sigma"] for m in self.models
+        )
 
     def population_draw(self):
         f = population_model[self.model]
         p = self.params[self.model]
-        self.unscaled_state = f(self.unscaled_state, p)
+        self.unscaled_state = float(
+            f(self.unscaled_state, p, rng=self.noise)[0]
+        )
         return self.unscaled_state
 
+    def get_snapshot(self, noise=True):
+        snapshot = super().get_snapshot(noise)
+        snapshot.extra = self.model
+        return snapshot
+
+    def restore(self, snapshot):
+        self.model = snapshot.extra
+        return super().restore(snapshot)
+
     def reset(self):
-        self.state = np.array([self.init_state / self.K - 1])
-        self.unscaled_state = self.init_state
-        self.model = np.random.choice(self.models)
-        self.years_passed = 0
-        self.reward = 0
-        self.unscaled_action = 0
-        return self.state
+        self.model = self.noise.choice(self.models)
+        return super().reset()
 
 
 # Growth Functions
-def allen(x, params, size=1):
+def allen(x, params, size=1, rng=None):
     with np.errstate(divide="ignore"):
         mu = (
             np.log(x)
@@ -260,19 +349,19 @@ def allen(x, params, size=1):
             * (1 - params["C"])
             / params["K"]
         )
-    return np.maximum(0, np.random.lognormal(mu, params["sigma"], size))
+    return np.maximum(0, _lognormal(mu, params["sigma"], size, rng))
 
 
-def beverton_holt(x, params, size=1):
+def beverton_holt(x, params, size=1, rng=None):
     x = np.clip(x, 0.0, np.inf)
     A = np.clip(params["r"], 0.0, np.inf) + 1
     with np.errstate(divide="ignore"):
         B = np.clip(params["K"], 0, np.inf) / np.clip(params["r"], 0.0, np.inf)
         mu = np.log(A) + np.log(x) - np.log(1 + x / B)
-    return np.maximum(0, np.random.lognormal(mu, params["sigma"], size))
+    return np.maximum(0, _lognormal(mu, params["sigma"], size, rng))
 
 
-def may(x, params, size=1):
+def may(x, params, size=1, rng=None):
     with np.errstate(divide="ignore"):
         r = params["r"]
         M = params["M"]
@@ -285,13 +374,13 @@ def may(x, params, size=1):
             - a * np.power(x, q) / (np.power(x, q) + np.power(b, q))
         )
         mu = np.log(np.clip(exp_mu, 0, np.inf))
-    state = np.random.lognormal(mu, params["sigma"], size)
+    state = _lognormal(mu, params["sigma"], size, rng)
     return np.maximum(0, state)
 
 
 # be careful that K is chosen correctly (independent of M) to ensure
 # state space is correct size.  Default parameters of Myers class should work
-def myers(x, params, size=1):
+def myers(x, params, size=1, rng=None):
     A = params["r"] + 1
     with np.errstate(divide="ignore"):
         mu = (
@@ -299,13 +388,51 @@ def myers(x, params, size=1):
             + params["theta"] * np.log(x)
             - np.log(1 + np.power(x, params["theta"]) / params["M"])
         )
-    return np.maximum(0, np.random.lognormal(mu, params["sigma"], size))
+    return np.maximum(0, _lognormal(mu, params["sigma"], size, rng))
 
 
-def ricker(x, params, size=1):
+def ricker(x, params, size=1, rng=None):
     with np.errstate(divide="ignore"):
         mu = np.log(x) + params["r"] * (1 - x / params["K"])
-    return np.maximum(0, np.random.lognormal(mu, params["sigma"], size))
+    return np.maximum(0, _lognormal(mu, params["sigma"], size, rng))
+
+
+def _lognormal(mu, sigma, size, rng):
+    """
+    lognormal draw from the global np.random state, or from `rng` (a
+    Generator or NoiseStream) when one is given; no draw when sigma is 0
+    """
+    if not np.any(sigma):
+        return np.exp(mu) * np.ones(size)
+    if rng is None:
+        return np.random.lognormal(mu, sigma, size)
+    if size == 1:
+        return np.reshape(np.exp(mu + sigma * rng.normal()), 1)
+    return np.exp(mu + sigma * rng.standard_normal(size))
+
+
+def may_constants(params):
+    """
+    (r, M, q, b**q) as floats, for may_mu_scalar
+    """
+    q = float(params["q"])
+    return (
+        float(params["r"]),
+        float(params["M"]),
+        q,
+        float(params["b"]) ** q,
+    )
+
+
+def may_mu_scalar(x, a, r, M, q, bq):
+    """
+    log-mean of `may` for a float state x > 0, from `may_constants`
+    """
+    xq = x**q
+    exp_mu = x + x * r * (1 - x / M) - a * xq / (xq + bq)
+    if exp_mu <= 0.0:
+        return -math.inf
+    return math.log(exp_mu)
 
 
 population_model = {
@@ -317,6 +444,123 @@ population_model = {
 }
 
 
+# Batched Growth Functions
+#
+# Array-native versions of the growth functions above.  `x` is an array of
+# states and any entry of `params` may be a scalar or an array broadcastable
+# against `x` (e.g. one parameter value per replicate).  Noise is drawn from
+# `rng` (a `np.random.Generator`) rather than the global `np.random` state,
+# and the result is written into `out` when a buffer is supplied.
+def allen_mu(x, params):
+    with np.errstate(divide="ignore"):
+        return (
+            np.log(x)
+            + params["r"]
+            * (1 - x / params["K"])
+            * (1 - params["C"])
+            / params["K"]
+        )
+
+
+def beverton_holt_mu(x, params):
+    x = np.clip(x, 0.0, np.inf)
+    r = np.clip(params["r"], 0.0, np.inf)
+    with np.errstate(divide="ignore"):
+        B = np.clip(params["K"], 0, np.inf) / r
+        return np.log(r + 1) + np.log(x) - np.log(1 + x / B)
+
+
+def may_mu(x, params):
+    r = params["r"]
+    M = params["M"]
+    a = params["a"]
+    q = params["q"]
+    b = params["b"]
+    xq = np.power(x, q)
+    exp_mu = x + x * r * (1 - x / M) - a * xq / (xq + np.power(b, q))
+    with np.errstate(divide="ignore"):
+        return np.log(np.clip(exp_mu, 0, np.inf))
+
+
+def myers_mu(x, params):
+    theta = params["theta"]
+    with np.errstate(divide="ignore"):
+        return (
+            np.log(params["r"] + 1)
+            + theta * np.log(x)
+            - np.log(1 + np.power(x, theta) / params["M"])
+        )
+
+
+def ricker_mu(x, params):
+    with np.errstate(divide="ignore"):
+        return np.log(x) + params["r"] * (1 - x / params["K"])
+
+
+def lognormal_draw(mu, sigma, rng=None, out=None):
+    """
+    Draw lognormal(mu, sigma) element-wise into `out`.
+
+    Equivalent to `np.maximum(0, np.random.lognormal(mu, sigma))`, but a
+    single standard-normal draw is taken from `rng` (default: the global
+    np.random state, so `np.random.seed` applies) for the whole batch and
+    no draw at all is made when every sigma is zero.
+    """
+    mu = np.asarray(mu, dtype=np.float64)
+    if out is None:
+        out = np.empty(mu.shape)
+    if np.any(sigma):
+        if rng is None:
+            rng = np.random
+        noise = rng.standard_normal(size=mu.shape)
+        np.multiply(noise, sigma, out=noise)
+        np.add(mu, noise, out=out)
+        np.exp(out, out=out)
+    else:
+        np.exp(mu, out=out)
+    return out
+
+
+def allen_batch(x, params, rng=None, out=None):
+    return lognormal_draw(allen_mu(x, params), params["sigma"], rng, out)
+
+
+def beverton_holt_batch(x, params, rng=None, out=None):
+    mu = beverton_holt_mu(x, params)
+    return lognormal_draw(mu, params["sigma"], rng, out)
+
+
+def may_batch(x, params, rng=None, out=None):
+    return lognormal_draw(may_mu(x, params), params["sigma"], rng, out)
+
+
+def myers_batch(x, params, rng=None, out=None):
+    return lognormal_draw(myers_mu(x, params), params["sigma"], rng, out)
+
+
+def ricker_batch(x, params, rng=None, out=None):
+    return lognormal_draw(ricker_mu(x, params), params["sigma"], rng, out)
+
+
+# batched counterparts of `population_model`, under the same names
+population_model_batch = {
+    "allen": allen_batch,
+    "beverton_holt": beverton_holt_batch,
+    "myers": myers_batch,
+    "may": may_batch,
+    "ricker": ricker_batch,
+}
+
+# log of the deterministic (median) growth step, under the same names
+population_model_mu = {
+    "allen": allen_mu,
+    "beverton_holt": beverton_holt_mu,
+    "myers": myers_mu,
+    "may": may_mu,
+    "ricker": ricker_mu,
+}
+
+
 register(
     id="conservation-v0",
     entry_point="gym_conservation.envs:Ricker",
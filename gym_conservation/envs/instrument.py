@@ -0,0 +1,176 @@
+import json
+import sys
+from time import perf_counter_ns
+
+import numpy as np
+from pandas import DataFrame
+
+PHASES = (
+    "unscale",
+    "perform_action",
+    "population_draw",
+    "rescale",
+    "compute_reward",
+    "step",
+    "wrappers",
+)
+
+
+# instrumented methods of BaseEcologyEnv and the phase each is counted in
+PHASE_METHODS = {
+    "get_unscaled_action": "unscale",
+    "get_unscaled_state": "unscale",
+    "perform_action": "perform_action",
+    "population_draw": "population_draw",
+    "get_state": "rescale",
+    "compute_reward": "compute_reward",
+}
+
+
+class StepProfiler:
+    """
+    Per-phase timing, call and allocation counters for an instrumented
+    BaseEcologyEnv, plus episode-length and termination-reason counters.
+    Calls count method calls made within step(), so "unscale" counts both
+    the action and the state conversion.
+
+    With `allocations=True`, allocations are counted as the change in
+    `sys.getallocatedblocks()` over a phase, i.e. net Python object blocks
+    still alive when the phase ends.  That call walks the allocator's
+    arenas, so it is off by default to keep the overhead low, and `allocs`
+    is reported as None.
+    """
+
+    def __init__(self, allocations=False):
+        self.allocations = allocations
+        self.blocks = sys.getallocatedblocks if allocations else _no_blocks
+        self.in_step = False
+        self.reset()
+
+    def reset(self):
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.time_ns = dict.fromkeys(PHASES, 0)
+        self.allocs = dict.fromkeys(PHASES, 0)
+        self.episode_lengths = []
+        self.terminations = {"extinction": 0, "Tmax": 0}
+
+    def add(self, phase, t0, b0):
+        self.time_ns[phase] += perf_counter_ns() - t0
+        self.allocs[phase] += self.blocks() - b0
+        self.calls[phase] += 1
+
+    def end_episode(self, length, extinct):
+        self.episode_lengths.append(length)
+        self.terminations["extinction" if extinct else "Tmax"] += 1
+
+    def summary(self):
+        phases = {}
+        for phase in PHASES:
+            calls = self.calls[phase]
+            if calls == 0:
+                continue
+            phases[phase] = dict(
+                calls=calls,
+                time_s=self.time_ns[phase] * 1e-9,
+                mean_us=self.time_ns[phase] * 1e-3 / calls,
+                allocs=self.allocs[phase] if self.allocations else None,
+            )
+        lengths = self.episode_lengths
+        return dict(
+            phases=phases,
+            episodes=len(lengths),
+            mean_episode_length=float(np.mean(lengths)) if lengths else None,
+            terminations=dict(self.terminations),
+        )
+
+    def report(self, path=None):
+        """
+        Per-phase table as a DataFrame; also written to `path` as JSON
+        (with the episode counters) when given.
+        """
+        summary = self.summary()
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(summary, f, indent=1)
+        return DataFrame.from_dict(summary["phases"], orient="index")
+
+
+def instrument_env(env, enabled=True, allocations=False):
+    """
+    Turn step() instrumentation of `env` on or off and return its
+    StepProfiler.  `env` may be wrapped (e.g. by gym.make), in which case
+    the time spent in the wrappers is reported as the "wrappers" phase.
+
+    Instrumentation wraps `step` and the phase methods it calls on the
+    instances only, so envs that are not instrumented run the normal,
+    uninstrumented code, and instrumented ones run their own step().
+    """
+    base = env.unwrapped
+    if not enabled:
+        for name in ("step",) + tuple(PHASE_METHODS):
+            base.__dict__.pop(name, None)
+        if env is not base:
+            env.__dict__.pop("step", None)
+        return getattr(base, "profiler", None)
+
+    instrument_env(env, enabled=False)
+    profiler = StepProfiler(allocations)
+    blocks = profiler.blocks
+    base.profiler = profiler
+    for name, phase in PHASE_METHODS.items():
+        setattr(base, name, _timed(getattr(base, name), profiler, phase))
+    base.step = _timed_step(base, base.step, profiler)
+    if env is not base:
+        wrapped_step = type(env).step.__get__(env)
+
+        def step(action):
+            t0, b0 = perf_counter_ns(), blocks()
+            inner = profiler.time_ns["step"], profiler.allocs["step"]
+            out = wrapped_step(action)
+            profiler.add("wrappers", t0, b0)
+            profiler.time_ns["wrappers"] -= profiler.time_ns["step"] - inner[0]
+            profiler.allocs["wrappers"] -= profiler.allocs["step"] - inner[1]
+            return out
+
+        env.step = step
+    return profiler
+
+
+def _timed(method, profiler, phase):
+    """
+    `method`, counted in `phase` when called from within step().
+    """
+    blocks = profiler.blocks
+
+    def timed(*args):
+        if not profiler.in_step:
+            return method(*args)
+        t0, b0 = perf_counter_ns(), blocks()
+        out = method(*args)
+        profiler.add(phase, t0, b0)
+        return out
+
+    return timed
+
+
+def _timed_step(env, step, profiler):
+    blocks = profiler.blocks
+
+    def timed_step(action):
+        t0, b0 = perf_counter_ns(), blocks()
+        profiler.in_step = True
+        try:
+            out = step(action)
+        finally:
+            profiler.in_step = False
+        if out[2]:
+            extinct = bool(env.unscaled_state <= 0.0)
+            profiler.end_episode(env.years_passed, extinct)
+        profiler.add("step", t0, b0)
+        return out
+
+    return timed_step
+
+
+def _no_blocks():
+    return 0
@@ -0,0 +1,127 @@
+import numpy as np
+
+from gym_conservation.envs.growth_models import population_model_mu
+
+
+class ModelPosterior:
+    """
+    Steps every candidate growth model of a `ModelUncertainty` env at once
+    and keeps a posterior over which one is generating the data.
+
+    Candidates sharing a growth function are evaluated together, with
+    their parameters stacked into arrays, so one call of each
+    `population_model_mu` entry covers all of them.  `log_likelihood(x, y)`
+    is the lognormal log-density of the transition x -> y under each
+    model, as a vector, and `update(x, y)` adds it to the log posterior.
+    Here x is the state the growth is applied to, i.e. the previous state
+    plus the unscaled action for BaseEcologyEnv dynamics.
+
+    Models with sigma = 0 are deterministic, which would make the
+    likelihood a point mass; their sigma is floored at `min_sigma` so that
+    a mismatching model is ruled out but rounding error is not.
+    """
+
+    def __init__(self, env, prior=None, min_sigma=1e-6):
+        env = getattr(env, "unwrapped", env)
+        self.models = list(env.models)
+        self.n_models = len(self.models)
+        params = [env.params[m] for m in self.models]
+        self.sigma = np.array([p["sigma"] for p in params], dtype=np.float64)
+        self._likelihood_sigma = np.maximum(self.sigma, min_sigma)
+        # candidates grouped by growth function, parameters stacked
+        self.groups = []
+        for name in dict.fromkeys(self.models):
+            index = np.array(
+                [i for i, m in enumerate(self.models) if m == name]
+            )
+            stacked = {
+                k: np.array([params[i][k] for i in index], dtype=np.float64)
+                for k in params[index[0]]
+            }
+            self.groups.append((population_model_mu[name], index, stacked))
+
+        if prior is None:
+            prior = np.full(self.n_models, 1.0 / self.n_models)
+        self.log_prior = np.log(np.asarray(prior, dtype=np.float64))
+        self.reset()
+
+    def reset(self):
+        """
+        Back to the prior, e.g. at the start of an episode.
+        """
+        self.log_posterior = self.log_prior - _logsumexp(self.log_prior)
+        self.log_evidence = 0.0
+        return self.posterior
+
+    @property
+    def posterior(self):
+        return np.exp(self.log_posterior)
+
+    def log_mean(self, x):
+        """
+        Log-mean of the next state under each model, shape
+        `np.shape(x) + (n_models,)`.
+        """
+        x = np.asarray(x, dtype=np.float64)[..., None]
+        out = np.empty(x.shape[:-1] + (self.n_models,))
+        for mu, index, params in self.groups:
+            out[..., index] = mu(x, params)
+        return out
+
+    def log_likelihood(self, x, y):
+        """
+        Lognormal log-likelihood of the transitions x -> y under each
+        model, shape `np.shape(x) + (n_models,)`.  Transitions from or to
+        an extinct state are uninformative (zero for every model).
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)[..., None]
+        mu = self.log_mean(x)
+        informative = (x[..., None] > 0) & (y > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_y = np.log(y)
+            sigma = self._likelihood_sigma
+            z = (log_y - mu) / sigma
+            ll = -log_y - np.log(sigma * np.sqrt(2 * np.pi)) - 0.5 * z**2
+        ll = np.where(informative, ll, 0.0)
+        # a model predicting extinction cannot produce a live state
+        return np.where(np.isnan(ll), -np.inf, ll)
+
+    def update(self, x, y):
+        """
+        Bayes update on the transition x -> y (or arrays of transitions,
+        all generated by the same hidden model); returns the posterior.
+        """
+        ll = self.log_likelihood(x, y)
+        ll = ll.reshape(-1, self.n_models).sum(axis=0)
+        joint = self.log_posterior + ll
+        norm = _logsumexp(joint)
+        self.log_evidence += norm
+        self.log_posterior = joint - norm
+        return self.posterior
+
+    def step(self, x, rng=None):
+        """
+        Draw the next state from `x` under every model at once, shape
+        `np.shape(x) + (n_models,)`.
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        mu = self.log_mean(x)
+        with np.errstate(over="ignore"):
+            return np.exp(mu + self.sigma * rng.standard_normal(mu.shape))
+
+    def expected_next(self, x):
+        """
+        Posterior model-averaged expected next state from `x`.
+        """
+        with np.errstate(over="ignore"):
+            mean = np.exp(self.log_mean(x) + 0.5 * self.sigma**2)
+        return mean @ self.posterior
+
+
+def _logsumexp(a):
+    m = np.max(a)
+    if not np.isfinite(m):
+        return m
+    return m + np.log(np.sum(np.exp(a - m)))
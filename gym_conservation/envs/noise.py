@@ -0,0 +1,79 @@
+import numpy as np
+
+
+class NoiseStream:
+    """
+    Per-env source of randomness: a `np.random.Generator` seeded through
+    `env.seed()`, whose standard normal draws are generated in blocks and
+    handed out by index.  Blocks start at 32 draws and double on each
+    refill up to `block_size`, so short-lived envs stay small; a
+    long-running env holds 8 * block_size bytes of normals (32 KB by
+    default).  When packing many envs into one process, pass a smaller
+    `block_size` to `env.seed()` to trade speed for memory.
+
+    Generator draws are sequential, so the stream of normals (and hence a
+    seeded run) does not depend on `block_size`.  `standard_normal` mirrors
+    the Generator method, so a NoiseStream can be passed wherever the
+    growth functions expect an `rng`.
+    """
+
+    def __init__(self, seed=None, block_size=4096):
+        self.seed = seed
+        # separate streams, so choices never shift the block boundaries
+        normal_seed, choice_seed = np.random.SeedSequence(seed).spawn(2)
+        self.generator = np.random.default_rng(normal_seed)
+        self.choice_generator = np.random.default_rng(choice_seed)
+        self.block_size = block_size
+        self.next_size = min(32, block_size)
+        self.block = np.empty(0)
+        self.index = 0
+
+    def _refill(self):
+        self.block = self.generator.standard_normal(self.next_size)
+        self.next_size = min(2 * self.next_size, self.block_size)
+        self.index = 0
+
+    def normal(self):
+        """
+        A single standard normal draw, as a float.
+        """
+        if self.index >= len(self.block):
+            self._refill()
+        z = self.block[self.index]
+        self.index += 1
+        return float(z)
+
+    def standard_normal(self, size=None):
+        if size is None:
+            return self.normal()
+        n = int(np.prod(size))
+        out = np.empty(n)
+        filled = 0
+        while filled < n:
+            if self.index >= len(self.block):
+                self._refill()
+            k = min(n - filled, len(self.block) - self.index)
+            out[filled : filled + k] = self.block[self.index : self.index + k]
+            self.index += k
+            filled += k
+        return out.reshape(size)
+
+    def get_state(self):
+        """
+        The stream's position, for `set_state`.  Blocks are never written
+        in place, so the current block is shared rather than copied.
+        """
+        return (
+            self.generator.bit_generator.state,
+            self.choice_generator.bit_generator.state,
+            self.block,
+            self.index,
+        )
+
+    def set_state(self, state):
+        normal_state, choice_state, self.block, self.index = state
+        self.generator.bit_generator.state = normal_state
+        self.choice_generator.bit_generator.state = choice_state
+
+    def choice(self, *args, **kwargs):
+        return self.choice_generator.choice(*args, **kwargs)
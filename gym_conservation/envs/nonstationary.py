@@ -2,7 +2,12 @@ import numpy as np
 from gym.envs.registration import register
 
 from gym_conservation.envs.base_env import BaseEcologyEnv
-from gym_conservation.envs.growth_models import may
+from gym_conservation.envs.growth_models import (
+    may_batch,
+    may_constants,
+    may_mu_scalar,
+)
+from gym_conservation.envs.params import NonStationaryParams
 
 # Consider stochastic change in "a",
 # Consider dual-control with actions on both state and parameter
@@ -17,6 +22,8 @@ class NonStationaryV3(BaseEcologyEnv):
     As in all models, value is proportional to the state and actions are costly.
     """
 
+    growth_model = "may"
+
     def __init__(
         self,
         r=0.7,
@@ -35,39 +42,40 @@ class NonStationaryV3(BaseEcologyEnv):
         file="render.csv",
     ):
         super().__init__(
-            params={
-                "r": r,
-                "K": K,
-                "sigma": sigma,
-                "q": q,
-                "b": b,
-                "a": a,
-                "M": M,
-                "x0": init_state,
-                "cost": cost,
-                "benefit": benefit,
-                "alpha": alpha,
-                "beta": beta,
-            },
+            params=NonStationaryParams(
+                r=r,
+                K=K,
+                sigma=sigma,
+                q=q,
+                b=b,
+                a=a,
+                M=M,
+                x0=init_state,
+                cost=cost,
+                benefit=benefit,
+                alpha=alpha,
+                beta=beta,
+            ),
             Tmax=Tmax,
             file=file,
         )
-        self.init_a = a
+
+    def precompute(self):
+        super().precompute()
+        self._may = may_constants(self.params)
+        self._alpha = float(self.params["alpha"])
 
     def population_draw(self):
-        self.params["a"] = self.params["a"] + self.params["alpha"]
-        self.unscaled_state = may(self.unscaled_state, self.params)
+        self.dynamic.a += self._alpha
+        self.unscaled_state = self.growth_draw(self.unscaled_state)
         return self.unscaled_state
 
-    def reset(self):
-        self.state = np.array([self.init_state / self.K - 1])
-        self.unscaled_state = self.init_state
-        self.years_passed = 0
-        self.params["a"] = self.init_a
-        # for tracking only
-        self.reward = 0
-        self.unscaled_action = 0
-        return self.state
+    def growth_mu(self, x):
+        return may_mu_scalar(x, self.dynamic.a, *self._may)
+
+    def batch_population_draw(self, x, params, rng):
+        params["a"] += params["alpha"]
+        return may_batch(x, params, rng)
 
 
 class NonStationaryV5(BaseEcologyEnv):
@@ -81,6 +89,8 @@ class NonStationaryV5(BaseEcologyEnv):
     As in all models, value is proportional to the state and actions are costly.
     """
 
+    growth_model = "may"
+
     def __init__(
         self,
         r=0.7,
@@ -99,54 +109,63 @@ class NonStationaryV5(BaseEcologyEnv):
         file="render.csv",
     ):
         super().__init__(
-            params={
-                "r": r,
-                "K": K,
-                "sigma": sigma,
-                "q": q,
-                "b": b,
-                "a": a,
-                "M": M,
-                "x0": init_state,
-                "cost": cost,
-                "benefit": benefit,
-                "alpha": alpha,
-                "beta": beta,
-            },
+            params=NonStationaryParams(
+                r=r,
+                K=K,
+                sigma=sigma,
+                q=q,
+                b=b,
+                a=a,
+                M=M,
+                x0=init_state,
+                cost=cost,
+                benefit=benefit,
+                alpha=alpha,
+                beta=beta,
+            ),
             Tmax=Tmax,
             file=file,
         )
-        self.init_a = a
+
+    def precompute(self):
+        super().precompute()
+        self._may = may_constants(self.params)
+        self._alpha = float(self.params["alpha"])
 
     def population_draw(self):
-        self.params["a"] = self.params["a"] + self.params["alpha"]
-        self.unscaled_state = may(self.unscaled_state, self.params)
+        self.dynamic.a += self._alpha
+        self.unscaled_state = self.growth_draw(self.unscaled_state)
         return self.unscaled_state
 
+    def growth_mu(self, x):
+        return may_mu_scalar(x, self.dynamic.a, *self._may)
+
+    def batch_population_draw(self, x, params, rng):
+        params["a"] += params["alpha"]
+        return may_batch(x, params, rng)
+
     def perform_action(self, unscaled_action):
         self.unscaled_action = unscaled_action
         # Can move away from tipping point
-        self.params["a"] = np.maximum(
-            0.0,
-            self.params["a"]
-            - self.unscaled_action / (2 * self.params["K"] * 100.0),
+        self.dynamic.a = max(
+            0.0, self.dynamic.a - self.unscaled_action / (2 * self._K * 100.0)
         )
         return self.unscaled_action
 
+    def batch_perform_action(self, x, unscaled_action, params):
+        params["a"] = np.maximum(
+            0.0, params["a"] - unscaled_action / (2 * params["K"] * 100.0)
+        )
+        return x
+
     def compute_reward(self):
-        return self.benefit * self.unscaled_state / (
-            1 + self.unscaled_state
-        ) - np.power(self.unscaled_action, self.cost)
+        x = self.unscaled_state
+        return self._benefit * x / (1 + x) - self.unscaled_action**self._cost
 
-    def reset(self):
-        self.state = np.array([self.init_state / self.K - 1])
-        self.unscaled_state = self.init_state
-        self.years_passed = 0
-        self.params["a"] = self.init_a
-        # for tracking only
-        self.reward = 0
-        self.unscaled_action = 0
-        return self.state
+    def batch_compute_reward(self, x, unscaled_action, params):
+        return params["benefit"] * x / (1 + x) - np.power(
+            unscaled_action, params["cost"]
+        )
 
 
 class NonStationaryV6(NonStationaryV5):
@@ -187,7 +206,6 @@ class NonStationaryV6(NonStationaryV5):
             Tmax=Tmax,
             file=file,
         )
-        self.init_a = a
 
 
 register(
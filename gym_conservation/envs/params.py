@@ -0,0 +1,193 @@
+from collections.abc import Mapping
+from functools import partial
+
+
+class ParamRecord(Mapping):
+    """
+    Frozen, slotted record of model parameters.
+
+    Fields are read as attributes (`params.r`) or, like the dicts they
+    replace, by key (`params["r"]`, `dict(params)`, `params.items()`).
+    Records cannot be modified, so they are safe to share between env
+    instances and hashable; `replace(**changes)` returns a new record.
+    Values are stored as floats.
+    """
+
+    __slots__ = ()
+    _fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = cls._fields + tuple(cls.__dict__.get("__slots__", ()))
+        cls._field_set = frozenset(cls._fields)
+
+    def __init__(self, **values):
+        unknown = set(values) - self._field_set
+        if unknown:
+            raise TypeError(
+                "{} got unknown parameters {}".format(
+                    type(self).__name__, sorted(unknown)
+                )
+            )
+        for field in self._fields:
+            if field not in values:
+                raise TypeError(
+                    "{} is missing parameter '{}'".format(
+                        type(self).__name__, field
+                    )
+                )
+            object.__setattr__(self, field, float(values[field]))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(
+            "{} is frozen; use replace()".format(type(self).__name__)
+        )
+
+    def __getitem__(self, key):
+        if key not in self._field_set:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __hash__(self):
+        return hash((type(self), tuple(self.values())))
+
+    def __repr__(self):
+        return "{}({})".format(
+            type(self).__name__,
+            ", ".join("{}={!r}".format(k, v) for k, v in self.items()),
+        )
+
+    def __reduce__(self):
+        return (partial(type(self), **dict(self)), ())
+
+    def replace(self, **changes):
+        values = dict(self)
+        values.update(changes)
+        return type(self)(**values)
+
+
+class EcologyParams(ParamRecord):
+    """
+    parameters shared by all envs: growth rate, carrying capacity (which
+    also scales the state and action spaces), noise, initial state and
+    reward coefficients
+    """
+
+    __slots__ = ("r", "K", "sigma", "x0", "cost", "benefit")
+
+
+class AllenParams(EcologyParams):
+    __slots__ = ("C",)
+
+
+class MyersParams(EcologyParams):
+    __slots__ = ("theta", "M")
+
+
+class MayParams(EcologyParams):
+    __slots__ = ("M", "q", "b", "a")
+
+
+class NonStationaryParams(MayParams):
+    """
+    May parameters plus the drift `alpha` of `a`; `a` is its initial value
+    """
+
+    __slots__ = ("alpha", "beta")
+
+
+# record type of each population_model entry
+model_params = {
+    "allen": AllenParams,
+    "beverton_holt": EcologyParams,
+    "myers": MyersParams,
+    "may": MayParams,
+    "ricker": EcologyParams,
+}
+
+
+def as_params(values):
+    """
+    `values` as a parameter record: records are returned as they are and
+    dicts become the record type with exactly their keys (e.g. a dict
+    with the EcologyParams fields plus `C` becomes AllenParams).
+    """
+    if isinstance(values, ParamRecord):
+        return values
+    keys = frozenset(values)
+    for record in _record_types:
+        if record._field_set == keys:
+            return record(**values)
+    # no exact match: report what is missing or unknown
+    return EcologyParams(**values)
+
+
+_record_types = (
+    EcologyParams,
+    AllenParams,
+    MyersParams,
+    MayParams,
+    NonStationaryParams,
+)
+
+
+class EcologyState:
+    """
+    Mutable dynamic state of one env instance: the (unscaled) population
+    `x`, the year, and the current value `a` of a drifting parameter (NaN
+    for envs without one).
+    """
+
+    __slots__ = ("x", "years_passed", "a")
+
+    def __init__(self, x=0.0, years_passed=0, a=float("nan")):
+        self.x = x
+        self.years_passed = years_passed
+        self.a = a
+
+    def copy(self):
+        return EcologyState(self.x, self.years_passed, self.a)
+
+    def __repr__(self):
+        return "EcologyState(x={!r}, years_passed={!r}, a={!r})".format(
+            self.x, self.years_passed, self.a
+        )
+
+
+class EnvSnapshot:
+    """
+    Everything needed to put an env back where it was, as returned by
+    `env.get_snapshot()`: the params record (shared, since it is frozen), a
+    copy of the dynamic state, the last reward and action, the state of the
+    noise stream (None if not captured) and any env-specific `extra`.
+    """
+
+    __slots__ = (
+        "params",
+        "dynamic",
+        "reward",
+        "unscaled_action",
+        "noise",
+        "extra",
+    )
+
+    def __init__(
+        self, params, dynamic, reward, unscaled_action, noise=None, extra=None
+    ):
+        self.params = params
+        self.dynamic = dynamic
+        self.reward = reward
+        self.unscaled_action = unscaled_action
+        self.noise = noise
+        self.extra = extra
+
+    def __repr__(self):
+        return "EnvSnapshot({!r}, reward={!r}, unscaled_action={!r})".format(
+            self.dynamic, self.reward, self.unscaled_action
+        )
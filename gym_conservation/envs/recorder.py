@@ -0,0 +1,90 @@
+import atexit
+import itertools
+import os
+import zipfile
+
+import numpy as np
+from pandas import DataFrame
+
+_recorder_ids = itertools.count()
+
+
+class TrajectoryRecorder:
+    """
+    Buffered, lazily opened recorder for render() output.
+
+    Rows are kept in an in-memory buffer of `capacity` steps and flushed
+    in bulk, one .npy member per column, to an .npz archive named after
+    `file` plus the process id and a per-process counter (e.g. render.csv
+    -> render-<pid>-0.npz), so several envs or worker processes never
+    share or truncate the same file.  The buffer is allocated on the first
+    `record()` and the path (`None` until then) is fixed at the first
+    flush, so an env created before a fork writes from its own process.
+    Use `load_recording()` to read it back.
+    """
+
+    def __init__(self, file, columns, capacity=4096):
+        self.file = file
+        self.path = None
+        self.columns = list(columns)
+        self.capacity = capacity
+        self.buffer = None
+        self.n = 0
+        self.chunks = 0
+
+    def record(self, *values):
+        """
+        Record one value per column; array values record one row per
+        element (scalars are broadcast).
+        """
+        n = max(np.size(v) for v in values)
+        if self.buffer is None:
+            self.buffer = np.empty((len(self.columns), self.capacity))
+            atexit.register(self.flush)
+        if self.n + n > self.capacity:
+            self.flush()
+        if n > self.capacity:
+            self._write(np.stack([np.broadcast_to(v, n) for v in values]))
+            return
+        rows = slice(self.n, self.n + n)
+        for i, v in enumerate(values):
+            self.buffer[i, rows] = np.ravel(v)
+        self.n += n
+
+    def flush(self):
+        if self.n > 0:
+            self._write(self.buffer[:, : self.n])
+            self.n = 0
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+
+    def _write(self, data):
+        if self.path is None:
+            stem = os.path.splitext(self.file)[0]
+            self.path = "{}-{}-{}.npz".format(
+                stem, os.getpid(), next(_recorder_ids)
+            )
+        mode = "a" if self.chunks > 0 else "w"
+        with zipfile.ZipFile(self.path, mode) as archive:
+            for name, column in zip(self.columns, data):
+                member = "{}/{:06d}.npy".format(name, self.chunks)
+                with archive.open(member, "w", force_zip64=True) as f:
+                    np.lib.format.write_array(f, np.ascontiguousarray(column))
+        self.chunks += 1
+
+
+def load_recording(path):
+    """
+    Read an archive written by TrajectoryRecorder into a DataFrame.
+    """
+    columns = {}
+    with zipfile.ZipFile(path) as archive:
+        for member in archive.namelist():
+            name = member.split("/")[0]
+            with archive.open(member) as f:
+                columns.setdefault(name, []).append(
+                    np.lib.format.read_array(f)
+                )
+    return DataFrame({k: np.concatenate(v) for k, v in columns.items()})
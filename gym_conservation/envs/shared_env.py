@@ -1,19 +1,19 @@
-from csv import writer
-
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import numpy as np
 from pandas import DataFrame
 
+from gym_conservation.envs.batch_env import BatchEcologyEnv
+
 
-def csv_entry(self):
+def render_entry(self):
     row_contents = [
         self.years_passed,
         self.unscaled_state,
         self.unscaled_action,
         self.reward,
     ]
-    csv_writer = writer(self.write_obj)
-    csv_writer.writerow(row_contents)
+    self.recorder.record(*row_contents)
     return row_contents
 
 
@@ -43,37 +43,214 @@ def simulate_mdp(env, model, reps=1):
     return df
 
 
+def simulate_mdp_batch(env, model, reps=1, seed=None, run=None):
+    """
+    Batched simulate_mdp: all `reps` replicates are stepped together in a
+    BatchEcologyEnv and `model.predict` is called once per time step on the
+    (reps, 1) array of observations (analytic policies providing
+    `batch_action` are evaluated directly).  Results are written into
+    preallocated (reps, Tmax) arrays which become the DataFrame columns.
+
+    `env` may also be a BatchEcologyEnv or an EcologyVecEnv, in which case
+    `reps` is its number of copies.  If a TrajectoryRun is given as `run`,
+    the replicates are appended straight into its memory-mapped columns
+    and the run is returned instead of a DataFrame.
+    """
+    batch = getattr(env, "engine", env)
+    if not isinstance(batch, BatchEcologyEnv):
+        batch = BatchEcologyEnv(env, n_envs=reps, seed=seed, autoreset=False)
+    reps = batch.n_envs
+    autoreset = batch.autoreset
+    batch.autoreset = False
+    Tmax = batch.Tmax
+
+    if run is None:
+        state = np.empty((reps, Tmax))
+        action = np.empty((reps, Tmax))
+        reward = np.empty((reps, Tmax))
+    else:
+        views = run.reserve(reps)
+        state, action, reward = (
+            views["state"],
+            views["action"],
+            views["reward"],
+        )
+    obs = batch.reset()
+    unscaled_action = np.zeros(reps)
+    rewards = np.zeros(reps)
+    for t in range(Tmax):
+        # record
+        state[:, t] = batch.get_unscaled_state(obs)
+        action[:, t] = unscaled_action
+        reward[:, t] = rewards
+
+        # Predict and implement action for all replicates at once
+        if hasattr(model, "batch_action"):
+            x = batch.get_unscaled_state(obs)
+            act = batch.get_action(model.batch_action(x, batch.params))
+        else:
+            act, _state = model.predict(obs[:, None], deterministic=True)
+        obs, rewards, done, info = batch.step(act)
+        unscaled_action = batch.unscaled_action
+    batch.autoreset = autoreset
+    if run is not None:
+        run.flush()
+        return run
+
+    columns = {
+        "time": np.tile(np.arange(Tmax), reps),
+        "state": state.ravel(),
+        "action": action.ravel(),
+        "reward": reward.ravel(),
+        "rep": np.repeat(np.arange(reps), Tmax),
+    }
+    return DataFrame(columns, copy=False)
+
+
 def estimate_policyfn(env, model, reps=1, n=50):
-    row = []
+    """
+    Policy function on a grid of `n` states, from a single batched
+    `predict` call.  The policy is evaluated deterministically, so the
+    `reps` replicates are copies of the same curve.
+    """
     state_range = np.linspace(
-        env.observation_space.low,
-        env.observation_space.high,
+        env.observation_space.low[0],
+        env.observation_space.high[0],
         num=n,
         dtype=env.observation_space.dtype,
     )
-    for rep in range(reps):
-        for obs in state_range:
-            action, _state = model.predict(obs, deterministic=True)
-            if isinstance(action, np.ndarray):
-                action = action[0]
+    unscaled_state = (state_range + 1) * env.K
+    unscaled_action = batch_policy_action(env, model, state_range)
+    columns = {
+        "state": np.tile(unscaled_state, reps),
+        "action": np.tile(unscaled_action, reps),
+        "rep": np.repeat(np.arange(reps), n),
+    }
+    return DataFrame(columns, copy=False)
 
-            unscaled_state = env.get_unscaled_state(obs)
-            unscaled_action = env.get_unscaled_action(action)
 
-            row.append([unscaled_state, unscaled_action, rep])
+def estimate_policy_surface(env, model, grids=None, n=50, chunk_size=2**16):
+    """
+    Policy function over a grid in more than one variable, e.g. state x
+    the drifting `a` parameter of NonStationaryV5/V6:
+
+        estimate_policy_surface(env, model, {"a": np.linspace(0, 0.3, 100)})
+
+    `grids` maps "state" and/or env parameter names to 1-D arrays of
+    (unscaled) values; "state" defaults to `n` points spanning the
+    observation space.  Parameter axes only affect policies that provide
+    `batch_action` (the analytic policies); other models only see the
+    state.  The grid is evaluated `chunk_size` points at a time, so memory
+    beyond the returned DataFrame stays bounded for dense maps.
+    """
+    K = env.K
+    grids = dict(grids or {})
+    if "state" not in grids:
+        low = env.observation_space.low[0]
+        high = env.observation_space.high[0]
+        grids["state"] = (np.linspace(low, high, num=n) + 1) * K
+    names = ["state"] + [k for k in grids if k != "state"]
+    axes = [np.asarray(grids[k], dtype=np.float64) for k in names]
+    shape = tuple(len(axis) for axis in axes)
+    size = int(np.prod(shape))
+
+    columns = {k: np.empty(size) for k in names}
+    columns["action"] = np.empty(size)
+    for start in range(0, size, chunk_size):
+        chunk = slice(start, min(start + chunk_size, size))
+        index = np.unravel_index(np.arange(chunk.start, chunk.stop), shape)
+        params = dict(env.params)
+        for name, axis, i in zip(names, axes, index):
+            columns[name][chunk] = params[name] = axis[i]
+        obs = params.pop("state") / K - 1
+        columns["action"][chunk] = batch_policy_action(env, model, obs, params)
+    return DataFrame(columns, copy=False)
 
-    df = DataFrame(row, columns=["state", "action", "rep"])
-    return df
 
+def batch_policy_action(env, model, obs, params=None):
+    """
+    Unscaled actions of `model` at an array of scaled observations,
+    clipped to the action space as env.step() would.
+    """
+    K = env.K
+    if hasattr(model, "batch_action"):
+        if params is None:
+            params = env.params
+        unscaled_action = model.batch_action((obs + 1) * K, params)
+        return np.clip(unscaled_action, 0.0, 2 * K)
+    obs = np.asarray(obs, dtype=env.observation_space.dtype)
+    action, _state = model.predict(obs[:, None], deterministic=True)
+    action = np.reshape(action, len(obs))
+    return (np.clip(action, -1.0, 1.0) + 1) * K
+
+
+def trajectory_arrays(df, columns=("state", "action", "reward")):
+    """
+    (rep, time) arrays of `columns` from a simulate_mdp DataFrame (via a
+    single pivot rather than one boolean mask per replicate) or straight
+    from a TrajectoryRun. Returns `(time, arrays)`.
+    """
+    if isinstance(df, DataFrame):
+        wide = df.pivot(index="rep", columns="time", values=list(columns))
+        time = wide[columns[0]].columns.to_numpy()
+        return time, {c: wide[c].to_numpy() for c in columns}
+    return np.arange(df.Tmax), {c: df[c] for c in columns}
+
+
+def plot_mdp(
+    self,
+    df,
+    output="results.png",
+    aggregate=False,
+    n_traces=None,
+    quantiles=(0.05, 0.25, 0.5, 0.75, 0.95),
+    seed=None,
+):
+    """
+    Plot state, action and cumulative reward over time.
+
+    By default every replicate is drawn.  With `aggregate=True` the
+    `quantiles` of each panel across replicates are drawn instead, as
+    nested fan bands around the median, computed in one vectorized pass;
+    `n_traces` randomly sampled raw traces may be overlaid (all traces are
+    drawn when not aggregating).  Traces are drawn as a single
+    LineCollection per panel, so plotting time barely grows with reps.
+    """
+    time, arrays = trajectory_arrays(df)
+    panels = np.stack(
+        [
+            arrays["state"],
+            arrays["action"],
+            np.cumsum(arrays["reward"], axis=1),
+        ]
+    )
+    reps = panels.shape[1]
+    if n_traces is None:
+        n_traces = 0 if aggregate else reps
+    if n_traces < reps:
+        rng = np.random.default_rng(seed)
+        traces = panels[:, np.sort(rng.choice(reps, n_traces, False))]
+    else:
+        traces = panels
 
-def plot_mdp(self, df, output="results.png"):
     fig, axs = plt.subplots(3, 1)
-    for i in np.unique(df.rep):
-        results = df[df.rep == i]
-        episode_reward = np.cumsum(results.reward)
-        axs[0].plot(results.time, results.state, color="blue", alpha=0.3)
-        axs[1].plot(results.time, results.action, color="blue", alpha=0.3)
-        axs[2].plot(results.time, episode_reward, color="blue", alpha=0.3)
+    if aggregate:
+        q = np.nanquantile(panels, quantiles, axis=1)
+        for ax, bands in zip(axs, np.moveaxis(q, 1, 0)):
+            for j in range(len(quantiles) // 2):
+                ax.fill_between(
+                    time, bands[j], bands[-j - 1], color="blue", alpha=0.2
+                )
+            if len(quantiles) % 2:
+                ax.plot(time, bands[len(quantiles) // 2], color="blue")
+    alpha = 0.3 if not aggregate else 0.1
+    for ax, lines in zip(axs, traces):
+        if len(lines):
+            segments = np.stack(np.broadcast_arrays(time, lines), axis=-1)
+            ax.add_collection(
+                LineCollection(segments, colors="blue", alpha=alpha)
+            )
+            ax.autoscale_view()
 
     axs[0].set_ylabel("state")
     axs[1].set_ylabel("action")
@@ -84,8 +261,7 @@ def plot_mdp(self, df, output="results.png"):
 
 
 def plot_policyfn(self, df, output="policy.png"):
-    for i in np.unique(df.rep):
-        results = df[df.rep == i]
+    for i, results in df.groupby("rep", sort=False):
         plt.plot(results.state, results.action, color="blue")
     plt.savefig(output)
     plt.close("all")
@@ -0,0 +1,190 @@
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
+from pandas import DataFrame
+
+
+class TrajectoryStore:
+    """
+    On-disk store of simulation runs, one directory per run holding a
+    memory-mapped (rep, time) .npy array per column, plus an `index.json`
+    listing each run's shape, columns and env parameters.
+
+    Columns use the layout of simulate_mdp: (rep, Tmax) arrays in which
+    the state at time t is recorded with the action and reward of the
+    step that led to it (0 at t = 0).
+
+    Runs are written append-only, a block of replicates at a time, and
+    reopening a store only reads the index; replicate `i` of a run is an
+    O(1) slice of the memory map.
+
+        store = TrajectoryStore("campaign")
+        run = store.create_run("v5-fixed", reps=10**6, Tmax=500)
+        simulate_mdp_batch(env, model, reps=10**4, run=run)  # repeatedly
+        TrajectoryStore("campaign")["v5-fixed"].replicate(42)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.index_file = os.path.join(path, "index.json")
+        self.index = {}
+        self._deferred = None
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as f:
+                self.index = json.load(f)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __getitem__(self, name):
+        if name not in self.index:
+            raise KeyError(name)
+        return TrajectoryRun(self, name)
+
+    def runs(self):
+        """
+        The index as a DataFrame, one row per run.
+        """
+        rows = [
+            dict(name=name, reps=v["reps"], Tmax=v["Tmax"], n=v["n"])
+            for name, v in self.index.items()
+        ]
+        return DataFrame(rows, columns=["name", "reps", "Tmax", "n"])
+
+    def create_run(
+        self,
+        name,
+        reps,
+        Tmax,
+        params=None,
+        columns=("state", "action", "reward"),
+    ):
+        if name in self.index:
+            raise ValueError("run '{}' already exists".format(name))
+        os.makedirs(os.path.join(self.path, name))
+        for column in columns:
+            np.lib.format.open_memmap(
+                self._column_file(name, column),
+                mode="w+",
+                dtype=np.float64,
+                shape=(reps, Tmax),
+            )
+        self.index[name] = dict(
+            reps=reps,
+            Tmax=Tmax,
+            n=0,
+            columns=list(columns),
+            params={k: _json_value(v) for k, v in (params or {}).items()},
+        )
+        self._write_index()
+        return TrajectoryRun(self, name)
+
+    @contextmanager
+    def deferred_index(self):
+        """
+        Write index.json once on exit instead of on every change, e.g.
+        while creating many runs.
+        """
+        self._deferred = False
+        try:
+            yield self
+        finally:
+            changed, self._deferred = self._deferred, None
+            if changed:
+                self._write_index()
+
+    def _column_file(self, name, column):
+        return os.path.join(self.path, name, column + ".npy")
+
+    def _write_index(self):
+        if self._deferred is not None:
+            self._deferred = True
+            return
+        tmp = self.index_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, self.index_file)
+
+
+class TrajectoryRun:
+    """
+    One run of a TrajectoryStore. Columns are exposed as (rep, time)
+    memory maps, e.g. `run["state"][i]` is replicate i's state trajectory.
+    """
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.info = store.index[name]
+        self.columns = self.info["columns"]
+        self.params = self.info["params"]
+        self._arrays = {}
+
+    @property
+    def n(self):
+        """number of replicates written so far"""
+        return self.info["n"]
+
+    @property
+    def Tmax(self):
+        return self.info["Tmax"]
+
+    def __getitem__(self, column):
+        if column not in self._arrays:
+            self._arrays[column] = np.load(
+                self.store._column_file(self.name, column), mmap_mode="r+"
+            )
+        return self._arrays[column][: self.n]
+
+    def reserve(self, reps):
+        """
+        Claim the next `reps` replicate rows for writing and return the
+        writable (reps, Tmax) views of each column, keyed by column name.
+        """
+        start = self.n
+        if start + reps > self.info["reps"]:
+            raise ValueError("run '{}' is full".format(self.name))
+        self.info["n"] = start + reps
+        self.store._write_index()
+        return {c: self[c][start : start + reps] for c in self.columns}
+
+    def append(self, **columns):
+        """
+        Append a block of replicates, one (reps, Tmax) array per column.
+        """
+        reps = len(next(iter(columns.values())))
+        views = self.reserve(reps)
+        for column, values in columns.items():
+            views[column][:] = values
+
+    def replicate(self, i):
+        """
+        Trajectory of replicate `i` as a DataFrame.
+        """
+        columns = {"time": np.arange(self.Tmax)}
+        for column in self.columns:
+            columns[column] = np.asarray(self[column][i])
+        return DataFrame(columns)
+
+    def to_frame(self):
+        """
+        All written replicates in the long format of simulate_mdp.
+        """
+        columns = {"time": np.tile(np.arange(self.Tmax), self.n)}
+        for column in self.columns:
+            columns[column] = np.asarray(self[column]).ravel()
+        columns["rep"] = np.repeat(np.arange(self.n), self.Tmax)
+        return DataFrame(columns)
+
+    def flush(self):
+        for array in self._arrays.values():
+            array.flush()
+
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
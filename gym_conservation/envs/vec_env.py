@@ -0,0 +1,73 @@
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from gym_conservation.envs.batch_env import BatchEcologyEnv
+
+
+class EcologyVecEnv(VecEnv):
+    """
+    stable-baselines3 VecEnv running `n_envs` copies of a registered
+    conservation env (e.g. "conservation-v5") in one BatchEcologyEnv,
+    as a drop-in replacement for DummyVecEnv / SubprocVecEnv.
+
+    Finished copies are reset automatically; their last observation is
+    returned in `info["terminal_observation"]` as SB3 expects.
+    """
+
+    def __init__(self, env_id, n_envs=1, seed=None, **env_kwargs):
+        self.engine = BatchEcologyEnv(
+            env_id, n_envs=n_envs, seed=seed, **env_kwargs
+        )
+        env = self.engine.env
+        super().__init__(n_envs, env.observation_space, env.action_space)
+        self.actions = None
+
+    def reset(self):
+        return self._obs(self.engine.reset())
+
+    def step_async(self, actions):
+        self.actions = actions
+
+    def step_wait(self):
+        state, reward, done, info = self.engine.step(self.actions)
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(done):
+            infos[i]["terminal_observation"] = np.float32(
+                info["terminal_observation"][i : i + 1]
+            )
+            infos[i]["TimeLimit.truncated"] = bool(info["truncated"][i])
+        return (
+            self._obs(state),
+            reward.astype(np.float32),
+            done.copy(),
+            infos,
+        )
+
+    def close(self):
+        return None
+
+    def seed(self, seed=None):
+        self.engine.seed(seed)
+        return [seed] * self.num_envs
+
+    def get_attr(self, attr_name, indices=None):
+        value = getattr(self.engine.env, attr_name)
+        return [value for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self.engine.env, attr_name, value)
+
+    def env_method(
+        self, method_name, *method_args, indices=None, **method_kwargs
+    ):
+        method = getattr(self.engine.env, method_name)
+        return [
+            method(*method_args, **method_kwargs)
+            for _ in self._get_indices(indices)
+        ]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+    def _obs(self, state):
+        return np.asarray(state, dtype=np.float32).reshape(-1, 1)
@@ -1,11 +1,16 @@
-from csv import writer
-
 import gym
 import numpy as np
 from gym import spaces
 from gym.envs.registration import register
 
 from gym_conservation.envs.growth_models import may
+from gym_conservation.envs.noise import NoiseStream
+from gym_conservation.envs.params import (
+    EcologyState,
+    EnvSnapshot,
+    NonStationaryParams,
+)
+from gym_conservation.envs.recorder import TrajectoryRecorder
 
 
 class VectorEcologyEnv(gym.Env):
@@ -22,35 +27,42 @@ class VectorEcologyEnv(gym.Env):
 
     def __init__(
         self,
-        params=dict(
-            r=0.7,
-            K=1.5,
-            M=1.2,
-            q=3,
-            b=0.15,
-            sigma=0.2,
-            a=0.19,
-            alpha=0.001,
-            beta=1.0,
-            x0=0.8,
-            cost=2.0,
-            benefit=1.0,
-        ),
+        params=None,
         reps=1,
         Tmax=500,
         file="render.csv",
     ):
+        if params is None:
+            params = NonStationaryParams(
+                r=0.7,
+                K=1.5,
+                M=1.2,
+                q=3,
+                b=0.15,
+                sigma=0.2,
+                a=0.19,
+                alpha=0.001,
+                beta=1.0,
+                x0=0.8,
+                cost=2.0,
+                benefit=1.0,
+            )
+        elif not isinstance(params, NonStationaryParams):
+            params = NonStationaryParams(**params)
         self.params = params
-        self.init_a = params["a"]
+        self.dynamic = EcologyState(a=params["a"])
         self.reps = reps
         self.Tmax = Tmax
         self.file = file
-        # Initialize reward, action, years_passed, etc
-        self.reset()
+        # unseeded until seed() is called
+        self.noise = NoiseStream()
 
-        # for render() method only
+        # for render() method only; nothing is opened until first flush
+        self.recorder = None
         if file is not None:
-            self.write_obj = open(file, "w+")
+            self.recorder = TrajectoryRecorder(
+                file, ["time", "state", "action", "reward", "rep"]
+            )
 
         self.action_space = spaces.Box(
             np.array([-1], dtype=np.float32),
@@ -62,6 +74,14 @@ class VectorEcologyEnv(gym.Env):
             np.full(reps, 1, dtype=np.float32),
             dtype=np.float32,
         )
+        # Initialize reward, action, years_passed, etc
+        self.reset()
+
+    def seed(self, seed=None, block_size=None):
+        if block_size is None:
+            block_size = self.noise.block_size
+        self.noise = NoiseStream(seed, block_size)
+        return [seed]
 
     def step(self, action):
         self.action = action  # for record keeping/render purposes
@@ -82,12 +102,37 @@ class VectorEcologyEnv(gym.Env):
     def reset(self):
         init_state = np.full(self.reps, self.params["x0"], dtype=np.float32)
         self.state = self.get_state(init_state)
-        self.params["a"] = self.init_a
+        self.dynamic.a = self.params["a"]
         self.years_passed = 0
         self.reward = 0
         self.action = self.get_action(0.0)
         return self.state
 
+    def get_snapshot(self, noise=True):
+        """
+        Copy of the current state of the ensemble, for `restore()`.  The
+        dynamic record holds the (scaled) state vector as `x`, and
+        `unscaled_action` the last action as given to step().
+        """
+        return EnvSnapshot(
+            self.params,
+            EcologyState(self.state.copy(), self.years_passed, self.dynamic.a),
+            np.copy(self.reward),
+            np.copy(self.action),
+            self.noise.get_state() if noise else None,
+        )
+
+    def restore(self, snapshot):
+        self.params = snapshot.params
+        self.dynamic = EcologyState(a=snapshot.dynamic.a)
+        self.state = snapshot.dynamic.x.copy()
+        self.years_passed = snapshot.dynamic.years_passed
+        self.reward = np.copy(snapshot.reward)
+        self.action = np.copy(snapshot.unscaled_action)
+        if snapshot.noise is not None:
+            self.noise.set_state(snapshot.noise)
+        return self.state
+
     def compute_reward(self, state, action):
         a = self.get_unscaled_action(action)
         s = self.get_unscaled_state(state)
@@ -99,28 +144,27 @@ class VectorEcologyEnv(gym.Env):
     def render(self, mode="human"):
         state = self.get_unscaled_state(self.state)
         action = self.get_unscaled_action(self.action)
-        reward = self.reward
-        csv_writer = writer(self.write_obj)
-        for i in range(self.reps):
-            row_contents = [self.years_passed, state[i], action, reward, i]
-            csv_writer.writerow(row_contents)
+        self.recorder.record(
+            self.years_passed, state, action, self.reward, np.arange(self.reps)
+        )
         return None
 
     def close(self):
-        if self.file is not None:
-            self.write_obj.close()
+        if self.recorder is not None:
+            self.recorder.close()
 
     def perform_action(self, s, a):
         action = a
-        self.params["a"] = np.maximum(
+        self.dynamic.a = np.maximum(
             0.0,
-            self.params["a"] - action / (2 * self.params["K"] * 100.0),
+            self.dynamic.a - action / (2 * self.params["K"] * 100.0),
         )
         return s
 
     def population_draw(self, s):
-        self.params["a"] = self.params["a"] + self.params["alpha"]
-        next_state = may(s, self.params)
+        self.dynamic.a = self.dynamic.a + self.params["alpha"]
+        params = dict(self.params, a=self.dynamic.a)
+        next_state = may(s, params, np.shape(s), self.noise)
         return np.clip(next_state, 0, 2 * self.params["K"])
 
     def get_unscaled_action(self, action):
@@ -1,5 +1,29 @@
 from gym_conservation.models.policies import (
     fixed_action,
+    mpc,
     target_state,
     user_action,
 )
+from gym_conservation.models.rollout import branch_rollouts, rollout_policy
+from gym_conservation.models.sweep import sweep
+from gym_conservation.models.evaluation import (
+    compare_policies,
+    evaluate,
+    evaluate_sequential,
+    noise_paths,
+)
+from gym_conservation.models.bifurcation import (
+    basins,
+    equilibria,
+    tipping_points,
+)
+from gym_conservation.models.cache import KernelCache
+from gym_conservation.models.dp import (
+    DiscreteModel,
+    dp_policy,
+    policy_iteration,
+    solve_mdp,
+    value_iteration,
+)
+from gym_conservation.models.lookup import compile_policy, lookup_policy
+from gym_conservation.models.numpy_policy import export_policy, numpy_policy
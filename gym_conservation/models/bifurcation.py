@@ -0,0 +1,166 @@
+import numpy as np
+from pandas import DataFrame
+
+from gym_conservation.envs.growth_models import population_model_mu
+
+
+def equilibria(model, grid, params=None, x_max=None, n=2000):
+    """
+    Fixed points of the deterministic growth map f(x) = exp(mu(x)) (the
+    median of the lognormal draw) and their stability, over a grid of one
+    or two parameters.
+
+    `model` is a `population_model` name (e.g. "may") or an env, whose
+    growth model and params are used; `params` overrides or supplies the
+    remaining parameters and `grid` maps one or two parameter names to
+    1-d arrays of values, e.g. `{"a": np.linspace(0, 0.4, 401)}`.
+    Fixed points in (0, x_max] are bracketed on an `n` point state grid
+    and refined by bisection, all parameter values at once.
+
+    Returns a tidy DataFrame with one row per fixed point: the grid
+    parameters, `x`, the map's `slope` there and `stable` (|slope| < 1).
+    The extinction point x = 0 is always included.
+    """
+    mu, params = _resolve(model, params)
+    names, values = _grid(grid, params)
+    if x_max is None:
+        x_max = 2 * max(params.get("K", 1.0), params.get("M", 0.0))
+    # broadcast the parameters against a trailing state axis
+    p = {k: _expand(v) for k, v in params.items()}
+    p.update({k: _expand(v) for k, v in zip(names, values)})
+    x = np.linspace(0, x_max, n + 1)[1:]
+
+    g = _excess(mu, x, p)
+    g = np.broadcast_to(g, values[0].shape + x.shape)
+    sign = np.sign(g)
+    # sign changes, and roots falling exactly on the next grid point
+    idx = np.nonzero(
+        (sign[..., :-1] * sign[..., 1:] < 0)
+        | ((sign[..., 1:] == 0) & (sign[..., :-1] != 0))
+    )
+    point, i = idx[:-1], idx[-1]
+    lo, hi = x[i], x[i + 1]
+    pp = {k: _take(v, point) for k, v in p.items()}
+    g_lo = _excess(mu, lo, pp)
+    for _ in range(50):
+        mid = 0.5 * (lo + hi)
+        g_mid = _excess(mu, mid, pp)
+        left = np.sign(g_mid) == np.sign(g_lo)
+        lo = np.where(left, mid, lo)
+        g_lo = np.where(left, g_mid, g_lo)
+        hi = np.where(left, hi, mid)
+    roots = 0.5 * (lo + hi)
+    h = 1e-6 * np.maximum(roots, 1.0)
+    slope = (_map(mu, roots + h, pp) - _map(mu, roots - h, pp)) / (2 * h)
+
+    # x = 0, with a one-sided slope
+    h0 = 1e-8 * x_max
+    slope0 = np.broadcast_to(_map(mu, h0, p)[..., 0] / h0, values[0].shape)
+
+    columns = {}
+    for name, v in zip(names, values):
+        columns[name] = np.concatenate([v.ravel(), v[point]])
+    columns["x"] = np.concatenate([np.zeros(values[0].size), roots])
+    columns["slope"] = np.concatenate([slope0.ravel(), slope])
+    df = DataFrame(columns)
+    df["stable"] = np.abs(df["slope"]) < 1
+    return df.sort_values(names + ["x"], ignore_index=True)
+
+
+def tipping_points(model, grid, params=None, x_max=None, n=2000):
+    """
+    Bifurcations along the first parameter of `grid` (for each value of
+    the second, if any): the points where the number of stable fixed points
+    changes, e.g. where a stable equilibrium is lost in a saddle-node
+    (tipping) bifurcation.  Locations are midpoints of the grid cells in
+    which the change happens, so their resolution is the grid spacing.
+
+    Returns a DataFrame with the location, the other grid parameter, and
+    the number of stable fixed points `before` and `after`.
+    """
+    names = list(grid)
+    df = equilibria(model, grid, params, x_max, n)
+    counts = df[df.stable].groupby(names).size()
+    full = np.zeros([len(np.atleast_1d(grid[k])) for k in names], dtype=int)
+    index = [
+        np.searchsorted(
+            np.atleast_1d(grid[k]), counts.index.get_level_values(k)
+        )
+        for k in names
+    ]
+    full[tuple(index)] = counts.values
+    if full.ndim == 1:
+        full = full[:, None]
+    first = np.atleast_1d(grid[names[0]])
+    change = np.nonzero(full[1:] != full[:-1])
+    columns = {names[0]: 0.5 * (first[change[0]] + first[change[0] + 1])}
+    if len(names) > 1:
+        columns[names[1]] = np.atleast_1d(grid[names[1]])[change[1]]
+    columns["before"] = full[change]
+    columns["after"] = full[change[0] + 1, change[1]]
+    return DataFrame(columns)
+
+
+def basins(model, grid, x0, params=None, steps=1000, tol=1e-6):
+    """
+    Basin-of-attraction map: iterate the deterministic growth map from
+    every initial state in `x0` at every point of the parameter `grid`.
+
+    Returns `(final, converged)`, arrays of shape grid shape + (len(x0),)
+    holding the state reached after `steps` iterations and whether it had
+    settled to within `tol` (False e.g. on cycles).  States of 0 after
+    convergence are extinction; matching `final` against the stable rows
+    of `equilibria` labels the basins.
+    """
+    mu, params = _resolve(model, params)
+    names, values = _grid(grid, params)
+    p = {k: _expand(v) for k, v in params.items()}
+    p.update({k: _expand(v) for k, v in zip(names, values)})
+    x = np.broadcast_to(
+        np.asarray(x0, dtype=np.float64), values[0].shape + np.shape(x0)
+    ).copy()
+    previous = x
+    for _ in range(steps):
+        previous, x = x, _map(mu, x, p)
+    x[~np.isfinite(x)] = 0.0
+    return x, np.abs(x - previous) <= tol * np.maximum(1.0, np.abs(x))
+
+
+def _resolve(model, params):
+    if isinstance(model, str):
+        return population_model_mu[model], dict(params or {})
+    env = getattr(model, "unwrapped", model)
+    merged = dict(env.params)
+    merged.update(params or {})
+    return population_model_mu[env.growth_model], merged
+
+
+def _grid(grid, params):
+    names = list(grid)
+    if not 1 <= len(names) <= 2:
+        raise ValueError("grid must have one or two parameters")
+    values = np.meshgrid(
+        *[np.asarray(grid[k], dtype=np.float64) for k in names],
+        indexing="ij",
+    )
+    return names, values
+
+
+def _expand(value):
+    value = np.asarray(value)
+    return value[..., None] if value.ndim else value
+
+
+def _take(value, point):
+    if np.ndim(value) == 0:
+        return value
+    return value[..., 0][point]
+
+
+def _map(mu, x, params):
+    with np.errstate(over="ignore", invalid="ignore"):
+        return np.exp(mu(x, params))
+
+
+def _excess(mu, x, params):
+    return _map(mu, x, params) - x
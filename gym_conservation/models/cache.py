@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+# parameters that do not enter the transition kernel
+_REWARD_PARAMS = ("x0", "cost", "benefit")
+
+
+class KernelCache:
+    """
+    Content-addressed, size-bounded on-disk cache of discretized transition
+    kernels (see DiscreteModel).
+
+    Entries are keyed by a hash of the growth model name, the parameters
+    that affect its dynamics, the state/action grids and the noise model,
+    and stored as a directory of .npy arrays in the banded sparse layout
+    of DiscreteModel, which are memory-mapped when loaded.  Once the cache
+    exceeds `max_bytes`, least recently used entries are evicted.
+    """
+
+    def __init__(self, path=None, max_bytes=2**30):
+        if path is None:
+            path = os.path.join(
+                os.path.expanduser("~"), ".cache", "gym_conservation"
+            )
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, model, params, states, actions, tol, noise="lognormal"):
+        h = hashlib.sha256()
+        dynamics = {
+            k: float(v) for k, v in params.items() if k not in _REWARD_PARAMS
+        }
+        h.update(
+            json.dumps(
+                [model, noise, float(tol), dynamics], sort_keys=True
+            ).encode()
+        )
+        for grid in (states, actions):
+            h.update(np.ascontiguousarray(grid, dtype=np.float64).tobytes())
+        return h.hexdigest()
+
+    def get(self, key):
+        entry = os.path.join(self.path, key)
+        if not os.path.isdir(entry):
+            return None
+        os.utime(entry)
+        return {
+            name[:-4]: np.load(os.path.join(entry, name), mmap_mode="r")
+            for name in os.listdir(entry)
+            if name.endswith(".npy")
+        }
+
+    def put(self, key, arrays):
+        entry = os.path.join(self.path, key)
+        tmp = entry + ".tmp-{}".format(os.getpid())
+        os.makedirs(tmp, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, name + ".npy"), array)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # another process stored the same entry first
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """
+        List of (key, bytes, last use) tuples, least recently used first.
+        """
+        out = []
+        for key in os.listdir(self.path):
+            entry = os.path.join(self.path, key)
+            if not os.path.isdir(entry) or ".tmp-" in key:
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(entry, name))
+                for name in os.listdir(entry)
+            )
+            out.append((key, size, os.path.getmtime(entry)))
+        return sorted(out, key=lambda e: e[2])
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.join(self.path, key), ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for key, _, _ in self.entries():
+            shutil.rmtree(os.path.join(self.path, key), ignore_errors=True)
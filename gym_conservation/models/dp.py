@@ -0,0 +1,266 @@
+import numpy as np
+
+from gym_conservation.envs.base_env import BaseEcologyEnv
+from gym_conservation.envs.growth_models import population_model_mu
+
+
+class DiscreteModel:
+    """
+    Discretization of a stationary growth-model env (Ricker, May, Allen,
+    ...) onto a grid of `n_states` states and `n_actions` actions.
+
+    Actions add to the state before growth, so the transition from (s, a)
+    only depends on the post-action state y = s + a.  Transitions are
+    stored once per distinct y as a band of `width` consecutive next-state
+    cells (`start`, `prob`), truncating lognormal mass below `tol`; with
+    the default aligned grids there are only n_states + n_actions - 1
+    distinct y, which keeps 1000 x 1000 problems small.  With sigma == 0
+    the deterministic next state is split between its two neighbouring
+    grid points.  Grid state 0 is treated as extinction (no future value).
+
+    Rewards use the env's `batch_compute_reward`, assumed to be a benefit
+    of the next state minus a cost of the action, as in all of the envs.
+
+    Pass a KernelCache as `cache` to reuse transition kernels built for
+    the same model, parameters and grids.
+    """
+
+    def __init__(
+        self, env, n_states=100, n_actions=None, tol=1e-10, cache=None
+    ):
+        if getattr(env, "growth_model", None) is None:
+            raise ValueError("env has no growth_model to discretize")
+        # e.g. NonStationaryV3/V5/V6: `a` drifts, and in V5/V6 actions
+        # lower `a` instead of adding to the population
+        base = getattr(env, "unwrapped", env)
+        if (
+            type(base).perform_action is not BaseEcologyEnv.perform_action
+            or "alpha" in env.params
+        ):
+            raise ValueError(
+                "DiscreteModel needs stationary dynamics in which actions "
+                "add to the population"
+            )
+        K = env.params["K"]
+        if n_actions is None:
+            n_actions = n_states
+        self.env = env
+        self.states = np.linspace(0, 2 * K, n_states)
+        self.actions = np.linspace(0, 2 * K, n_actions)
+        self.tol = tol
+
+        kernel = None
+        if cache is not None:
+            key = cache.key(
+                env.growth_model, env.params, self.states, self.actions, tol
+            )
+            kernel = cache.get(key)
+        if kernel is None:
+            kernel = self._kernel()
+            if cache is not None:
+                cache.put(key, kernel)
+        self.y = kernel["y"]
+        self.y_index = kernel["y_index"]
+        self.start = kernel["start"]
+        self.prob = kernel["prob"]
+
+        params = dict(env.params)
+        benefit = env.batch_compute_reward(self.states, 0.0, params)
+        cost = env.batch_compute_reward(0.0, self.actions, params)
+        self.reward = self.expectation(benefit)[self.y_index] + (
+            cost[:, None] - env.batch_compute_reward(0.0, 0.0, params)
+        )
+
+    def _kernel(self):
+        post = self.states[None, :] + self.actions[:, None]
+        y, y_index = np.unique(np.round(post, 12), return_inverse=True)
+        mu = population_model_mu[self.env.growth_model](y, self.env.params)
+        start, prob = self._band(mu, self.env.params["sigma"])
+        return dict(
+            y=y, y_index=y_index.reshape(post.shape), start=start, prob=prob
+        )
+
+    @property
+    def width(self):
+        return self.prob.shape[1]
+
+    def _band(self, mu, sigma):
+        n = len(self.states)
+        if sigma == 0:
+            x = np.clip(np.exp(mu), 0, self.states[-1])
+            j = np.clip(np.searchsorted(self.states, x) - 1, 0, n - 2)
+            w = (x - self.states[j]) / (self.states[j + 1] - self.states[j])
+            return j, np.stack([1 - w, w], axis=1)
+
+        log_edges = np.log(0.5 * (self.states[1:] + self.states[:-1]))
+        k = np.sqrt(-2 * np.log(self.tol))
+        lo = np.searchsorted(log_edges, mu - k * sigma)
+        hi = np.searchsorted(log_edges, mu + k * sigma) + 1
+        width = int(min(np.max(hi - lo), n))
+        start = np.clip(lo, 0, n - width)
+
+        cells = start[:, None] + np.arange(width)
+        edges = np.concatenate([[-np.inf], log_edges, [np.inf]])
+        with np.errstate(invalid="ignore"):
+            upper = _norm_cdf((edges[cells + 1] - mu[:, None]) / sigma)
+            lower = _norm_cdf((edges[cells] - mu[:, None]) / sigma)
+        prob = np.nan_to_num(upper - lower)
+        prob[prob < self.tol] = 0.0
+        # post-action state 0 stays extinct
+        extinct = np.isneginf(mu)
+        prob[extinct] = 0.0
+        prob[extinct, 0] = 1.0
+        start[extinct] = 0
+        prob /= prob.sum(axis=1, keepdims=True)
+        return start, prob
+
+    def expectation(self, values):
+        """
+        E[values(next state)] for every distinct post-action state y.
+        """
+        cells = self.start[:, None] + np.arange(self.width)
+        return np.sum(self.prob * values[cells], axis=1)
+
+    def q_values(self, V, gamma):
+        """
+        (n_actions, n_states) action values given state values `V`.
+        """
+        V = self._absorb(V)
+        return self.reward + gamma * self.expectation(V)[self.y_index]
+
+    def transition_matrix(self, policy):
+        """
+        Dense (n_states, n_states) transition matrix under `policy`, an
+        array of action indices per state.
+        """
+        n = len(self.states)
+        y = self.y_index[policy, np.arange(n)]
+        P = np.zeros((n, n))
+        cells = self.start[y][:, None] + np.arange(self.width)
+        P[np.arange(n)[:, None], cells] = self.prob[y]
+        return P
+
+    def _absorb(self, V):
+        if self.states[0] == 0:
+            V = V.copy()
+            V[0] = 0.0
+        return V
+
+
+def value_iteration(mdp, gamma=0.99, tol=1e-8, max_iter=100000):
+    """
+    Returns `(policy, V)`: the optimal action index and value per state.
+    """
+    V = np.zeros(len(mdp.states))
+    for i in range(max_iter):
+        Q = mdp.q_values(V, gamma)
+        V_new = mdp._absorb(Q.max(axis=0))
+        delta = np.max(np.abs(V_new - V))
+        V = V_new
+        if delta < tol:
+            break
+    policy = mdp.q_values(V, gamma).argmax(axis=0)
+    return policy, V
+
+
+def policy_iteration(mdp, gamma=0.99, max_iter=1000):
+    """
+    Returns `(policy, V)` by exact policy evaluation and greedy improvement.
+    """
+    n = len(mdp.states)
+    rows = np.arange(n)
+    policy = np.zeros(n, dtype=np.int64)
+    for i in range(max_iter):
+        P = mdp.transition_matrix(policy)
+        r = mdp.reward[policy, rows]
+        if mdp.states[0] == 0:
+            P[:, 0] = 0.0
+            P[0] = 0.0
+            r[0] = 0.0
+        V = np.linalg.solve(np.eye(n) - gamma * P, r)
+        Q = mdp.q_values(V, gamma)
+        # keep the current action unless another is strictly better
+        current = Q[policy, rows]
+        best = Q.argmax(axis=0)
+        improve = Q[best, rows] > current + 1e-12 * np.abs(current).max()
+        if not improve.any():
+            break
+        policy = np.where(improve, best, policy)
+    return policy, V
+
+
+class dp_policy:
+    """
+    Policy from a solved DiscreteModel, with the `predict()` interface of
+    the policies in policies.py. States between grid points take the
+    action of the nearest grid state.
+    """
+
+    def __init__(self, env, mdp, policy, **kwargs):
+        self.env = env
+        self.states = mdp.states
+        self.unscaled_actions = mdp.actions[policy]
+        self.midpoints = 0.5 * (self.states[1:] + self.states[:-1])
+
+    def predict(self, obs, **kwargs):
+        state = self.env.get_unscaled_state(obs)
+        unscaled_action = self.batch_action(state, self.env.params)
+        action = self.env.get_action(float(unscaled_action))
+        return action, obs
+
+    def batch_action(self, unscaled_state, params):
+        i = np.searchsorted(self.midpoints, unscaled_state)
+        return self.unscaled_actions[i]
+
+
+def solve_mdp(
+    env,
+    gamma=0.99,
+    n_states=100,
+    n_actions=None,
+    method="value",
+    cache=None,
+):
+    """
+    Discretize `env`, solve it by value or policy iteration and return the
+    resulting `dp_policy` (whose `V` attribute holds the state values).
+    """
+    mdp = DiscreteModel(env, n_states, n_actions, cache=cache)
+    if method == "value":
+        policy, V = value_iteration(mdp, gamma)
+    elif method == "policy":
+        policy, V = policy_iteration(mdp, gamma)
+    else:
+        raise ValueError("method must be 'value' or 'policy'")
+    model = dp_policy(env, mdp, policy)
+    model.V = V
+    return model
+
+
+# Chebyshev coefficients of the Numerical Recipes erfc approximation
+_ERFC_COEFFS = (
+    -1.26551223,
+    1.00002368,
+    0.37409196,
+    0.09678418,
+    -0.18628806,
+    0.27886807,
+    -1.13520398,
+    1.48851587,
+    -0.82215223,
+    0.17087277,
+)
+
+
+def _norm_cdf(z):
+    """
+    Standard normal CDF (fractional error < 1.2e-7).
+    """
+    x = -z / np.sqrt(2)
+    a = np.abs(x)
+    t = 1 / (1 + 0.5 * a)
+    poly = 0.0
+    for c in reversed(_ERFC_COEFFS):
+        poly = c + t * poly
+    erfc = t * np.exp(-a * a + poly)
+    return 0.5 * np.where(x >= 0, erfc, 2 - erfc)
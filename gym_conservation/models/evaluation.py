@@ -0,0 +1,390 @@
+import itertools
+import math
+from collections import OrderedDict
+
+import numpy as np
+from pandas import DataFrame
+
+from gym_conservation.envs.batch_env import BatchEcologyEnv
+from gym_conservation.models.rollout import PathNoise, rollout_policy
+
+
+def noise_paths(reps, Tmax, seed=None, antithetic=False, qmc=False):
+    """
+    (reps, Tmax + 1) array of standard normal noise paths.
+
+    With `antithetic=True` the second half of the paths are the negated
+    first half.  With `qmc=True` the draws are Latin hypercube samples:
+    each time step's values are stratified across the paths (one draw per
+    equal-probability stratum, randomly permuted), which keeps the
+    variance reduction of quasi-Monte-Carlo at any horizon.
+    """
+    rng = np.random.default_rng(seed)
+    n = (reps + 1) // 2 if antithetic else reps
+    shape = (n, Tmax + 1)
+    if qmc:
+        strata = rng.permuted(
+            np.broadcast_to(np.arange(n)[:, None], shape), axis=0
+        )
+        z = _norm_ppf((strata + rng.uniform(size=shape)) / n)
+    else:
+        z = rng.standard_normal(shape)
+    if antithetic:
+        z = np.concatenate([z, -z])[:reps]
+    return z
+
+
+def compare_policies(
+    env,
+    policies,
+    reps=50,
+    seed=None,
+    antithetic=False,
+    qmc=False,
+    baseline=None,
+    level=0.95,
+):
+    """
+    Evaluate `policies` (a dict of name: policy) on the same pre-drawn
+    noise paths (common random numbers) and report each policy's mean
+    return together with its paired difference from `baseline` (default:
+    the first policy) and a `level` confidence interval for it.
+
+    Common noise makes the paired differences far less noisy than
+    comparing independent evaluations; `antithetic` and `qmc` (see
+    `noise_paths`) reduce the variance further.
+    """
+    if isinstance(env, str):
+        env = BatchEcologyEnv(env).env
+    names = list(policies)
+    if baseline is None:
+        baseline = names[0]
+    paths = noise_paths(reps, env.Tmax, seed, antithetic, qmc)
+
+    returns = {}
+    for name in names:
+        batch = BatchEcologyEnv(env, n_envs=reps, autoreset=False)
+        batch.rng = PathNoise(paths)
+        returns[name] = rollout_policy(batch, policies[name])
+
+    z = _norm_ppf(0.5 + level / 2)
+    rows = []
+    for name in names:
+        diff = _pair_means(returns[name] - returns[baseline], antithetic)
+        mean = _pair_means(returns[name], antithetic)
+        diff_se = np.std(diff, ddof=1) / np.sqrt(len(diff))
+        rows.append(
+            dict(
+                policy=name,
+                mean=np.mean(mean),
+                se=np.std(mean, ddof=1) / np.sqrt(len(mean)),
+                diff=np.mean(diff),
+                diff_se=diff_se,
+                diff_low=np.mean(diff) - z * diff_se,
+                diff_high=np.mean(diff) + z * diff_se,
+            )
+        )
+    return DataFrame(rows)
+
+
+def evaluate_sequential(
+    env,
+    policies,
+    batch_size=20,
+    max_episodes=1000,
+    rtol=0.01,
+    atol=0.0,
+    level=0.95,
+    seed=None,
+    antithetic=False,
+):
+    """
+    Evaluate one policy, or a dict of name: policy, in batches of
+    `batch_size` episodes until the estimates are good enough, instead of
+    a fixed number of episodes.
+
+    After each batch the mean return and its `level` confidence interval
+    are updated.  A policy stops when the interval's half-width is within
+    `max(atol, rtol * |mean|)` ("precise"), or, in a comparison, when the
+    paired-difference interval against the current best policy lies below
+    zero ("dominated"); all stop after `max_episodes` ("max_episodes").
+    Policies still running, and the current best as their comparator even
+    once it has stopped, share each batch's noise paths (common random
+    numbers, see `compare_policies`), so paired differences separate
+    quickly.  On a deterministic env every interval has zero width after
+    the first batch.
+
+    The intervals use Student-t quantiles and a Bonferroni correction over
+    the at most `ceil(max_episodes / batch_size)` batches, and, for the
+    differences, over the other policies, which may each become the best.
+    So for normally distributed returns each policy's interval holds at
+    every batch at once with probability at least `level`, and a policy
+    at least as good as all others is marked "dominated" with probability
+    at most `(1 - level) / 2`, however the stopping turns out.
+
+    Returns a DataFrame with each policy's `episodes`, `mean`, `se`, the
+    interval (`low`, `high`) and `status`.
+    """
+    if isinstance(env, str):
+        env = BatchEcologyEnv(env).env
+    if not isinstance(policies, dict):
+        policies = {"policy": policies}
+    if batch_size < (4 if antithetic else 2):
+        raise ValueError(
+            "batch_size must be at least 2, or 4 with antithetic sampling"
+        )
+    names = list(policies)
+    rng = np.random.default_rng(seed)
+    per_batch = 2 * (batch_size // 2) if antithetic else batch_size
+    alpha = (1 - level) / math.ceil(max_episodes / per_batch)
+    alpha_diff = alpha / max(1, len(names) - 1)
+    # returns of each policy by batch, to pair policies on shared batches
+    returns = {name: {} for name in names}
+    status = {name: None for name in names}
+    leader = None
+
+    for k in itertools.count():
+        active = [name for name in names if status[name] is None]
+        if not active:
+            break
+        running = list(active)
+        if leader is not None and leader not in running:
+            running.append(leader)
+        paths = noise_paths(batch_size, env.Tmax, rng, antithetic)
+        for name in running:
+            batch = BatchEcologyEnv(env, n_envs=batch_size, autoreset=False)
+            batch.rng = PathNoise(paths)
+            r = _pair_means(rollout_policy(batch, policies[name]), antithetic)
+            returns[name][k] = r
+
+        x = {
+            name: np.concatenate(list(returns[name].values()))
+            for name in names
+        }
+        leader = max(
+            (name for name in names if status[name] != "dominated"),
+            key=lambda name: x[name].mean(),
+        )
+        for name in active:
+            if name != leader:
+                # paired on the batches both have seen
+                common = [i for i in returns[name] if i in returns[leader]]
+                diff = np.concatenate(
+                    [returns[name][i] - returns[leader][i] for i in common]
+                )
+                t = _t_ppf(1 - alpha_diff / 2, len(diff) - 1)
+                if diff.mean() + t * _se(diff) < 0:
+                    status[name] = "dominated"
+                    continue
+            t = _t_ppf(1 - alpha / 2, len(x[name]) - 1)
+            if t * _se(x[name]) <= max(atol, rtol * abs(x[name].mean())):
+                status[name] = "precise"
+            elif len(x[name]) * (2 if antithetic else 1) >= max_episodes:
+                status[name] = "max_episodes"
+
+    rows = []
+    for name in names:
+        x = np.concatenate(list(returns[name].values()))
+        se = _se(x)
+        t = _t_ppf(1 - alpha / 2, len(x) - 1)
+        rows.append(
+            dict(
+                policy=name,
+                episodes=len(x) * (2 if antithetic else 1),
+                mean=x.mean(),
+                se=se,
+                low=x.mean() - t * se,
+                high=x.mean() + t * se,
+                status=status[name],
+            )
+        )
+    return DataFrame(rows)
+
+
+# memoized deterministic episodes: (env key, policy key) -> (return, length)
+rollout_cache = OrderedDict()
+ROLLOUT_CACHE_SIZE = 256
+
+
+def evaluate(
+    model,
+    env,
+    n_eval_episodes=10,
+    deterministic=True,
+    return_episode_rewards=False,
+    cache=True,
+):
+    """
+    Mean and standard deviation of the episode returns of `model` on
+    `env`, like stable_baselines3's `evaluate_policy`.
+
+    On a deterministic env (`env.deterministic`, i.e. sigma == 0) with
+    `deterministic=True`, a policy that declares itself deterministic (by
+    providing `cache_key()` or a true `deterministic` attribute) gives
+    identical episodes, so a single episode is run and repeated.  With
+    `cache=True`, those episodes are also memoized (LRU,
+    `ROLLOUT_CACHE_SIZE` entries) for policies providing a `cache_key()`
+    and acting on `env` itself, keyed by the env's class and parameters
+    and the policy's key.
+    """
+    base = env.unwrapped
+    env.reset()
+    repeatable = hasattr(model, "cache_key") or getattr(
+        model, "deterministic", False
+    )
+    if deterministic and repeatable and getattr(base, "deterministic", False):
+        key = None
+        if cache and hasattr(model, "cache_key"):
+            policy_env = getattr(model.env, "unwrapped", model.env)
+            if policy_env is base:
+                key = (_env_key(base), model.cache_key())
+        if key in rollout_cache:
+            rollout_cache.move_to_end(key)
+            episode = rollout_cache[key]
+        else:
+            episode = _run_episode(model, env, deterministic)
+            if key is not None:
+                rollout_cache[key] = episode
+                if len(rollout_cache) > ROLLOUT_CACHE_SIZE:
+                    rollout_cache.popitem(last=False)
+        episodes = [episode] * n_eval_episodes
+    else:
+        episodes = [
+            _run_episode(model, env, deterministic)
+            for _ in range(n_eval_episodes)
+        ]
+
+    rewards = [r for r, _ in episodes]
+    if return_episode_rewards:
+        return rewards, [n for _, n in episodes]
+    return float(np.mean(rewards)), float(np.std(rewards))
+
+
+def _run_episode(model, env, deterministic):
+    obs, done = env.reset(), False
+    total, length = 0.0, 0
+    while not done:
+        action, _ = model.predict(obs, deterministic=deterministic)
+        obs, reward, done, _ = env.step(action)
+        total += float(reward)
+        length += 1
+    return total, length
+
+
+def _env_key(env):
+    return (
+        type(env).__module__,
+        type(env).__qualname__,
+        repr(sorted(env.params.items())),
+        env.Tmax,
+        float(env.init_state),
+        repr(env.action_space),
+    )
+
+
+def _se(x):
+    return np.std(x, ddof=1) / np.sqrt(len(x))
+
+
+def _pair_means(x, antithetic):
+    """
+    antithetic pairs are averaged first, as they are not independent;
+    path i is paired with path i + ceil(n / 2) as in `noise_paths`, and
+    with odd n the unpaired last path of the first half is dropped
+    """
+    if not antithetic:
+        return x
+    half = (len(x) + 1) // 2
+    m = len(x) - half
+    return 0.5 * (x[:m] + x[half : half + m])
+
+
+def _norm_ppf(p):
+    """
+    Inverse standard normal CDF (P. J. Acklam's rational approximation,
+    relative error < 1.2e-9).
+    """
+    a = (
+        -39.69683028665376,
+        220.9460984245205,
+        -275.9285104469687,
+        138.3577518672690,
+        -30.66479806614716,
+        2.506628277459239,
+    )
+    b = (
+        -54.47609879822406,
+        161.5858368580409,
+        -155.6989798598866,
+        66.80131188771972,
+        -13.28068155288572,
+    )
+    c = (
+        -7.784894002430293e-03,
+        -3.223964580411365e-01,
+        -2.400758277161838,
+        -2.549732539343734,
+        4.374664141464968,
+        2.938163982698783,
+    )
+    d = (
+        7.784695709041462e-03,
+        3.224671290700398e-01,
+        2.445134137142996,
+        3.754408661907416,
+    )
+    p = np.asarray(p, dtype=np.float64)
+    q = np.minimum(p, 1 - p)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # tails
+        r = np.sqrt(-2 * np.log(q))
+        tail = _polyval(c, r) / (_polyval(d, r) * r + 1)
+        # central region
+        s = p - 0.5
+        r2 = s * s
+        central = s * _polyval(a, r2) / (_polyval(b, r2) * r2 + 1)
+    tail = np.where(p < 0.5, tail, -tail)
+    return np.where(q < 0.02425, tail, central)
+
+
+def _t_ppf(p, df):
+    """
+    Inverse Student-t CDF for p > 0.5 (G. W. Hill's algorithm 396,
+    exact for df 1 and 2).
+    """
+    p2 = 2 * (1 - p)
+    if df == 1:
+        return 1 / math.tan(p2 * math.pi / 2)
+    if df == 2:
+        return math.sqrt(2 / (p2 * (2 - p2)) - 2)
+    a = 1 / (df - 0.5)
+    b = 48 / (a * a)
+    c = ((20700 * a / b - 98) * a - 16) * a + 96.36
+    d = ((94.5 / (b + c) - 3) / b + 1) * math.sqrt(a * math.pi / 2) * df
+    x = d * p2
+    y = x ** (2 / df)
+    if y > 0.05 + a:
+        x = float(_norm_ppf(p2 / 2))
+        y = x * x
+        if df < 5:
+            c += 0.3 * (df - 4.5) * (x + 0.6)
+        c = (((0.05 * d * x - 5) * x - 7) * x - 2) * x + b + c
+        y = (((((0.4 * y + 6.3) * y + 36) * y + 94.5) / c - y - 3) / b + 1) * x
+        y = math.expm1(a * y * y)
+    else:
+        y = (
+            (
+                1 / (((df + 6) / (df * y) - 0.089 * d - 0.822) * (df + 2) * 3)
+                + 0.5 / (df + 4)
+            )
+            * y
+            - 1
+        ) * (df + 1) / (df + 2) + 1 / y
+    return math.sqrt(df * y)
+
+
+def _polyval(coeffs, x):
+    out = 0.0
+    for c in coeffs:
+        out = out * x + c
+    return out
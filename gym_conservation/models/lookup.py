@@ -0,0 +1,79 @@
+import warnings
+
+import numpy as np
+
+from gym_conservation.envs.shared_env import batch_policy_action
+
+
+class lookup_policy:
+    """
+    Policy tabulated on a grid of observations, evaluated by linear
+    interpolation.  Same `predict()` interface as the trained model it was
+    compiled from (see `compile_policy`), plus `batch_action` for the
+    batched simulators. Observations outside the grid take the action at
+    the nearest end of the grid.
+    """
+
+    def __init__(self, env, obs, actions, error=None, **kwargs):
+        self.env = env
+        self.obs = np.asarray(obs, dtype=np.float32)
+        self.actions = np.asarray(actions, dtype=np.float32)
+        self.error = error
+
+    def predict(self, obs, **kwargs):
+        obs = np.asarray(obs)
+        action = np.interp(obs, self.obs, self.actions).astype(np.float32)
+        return action, None
+
+    def batch_action(self, unscaled_state, params):
+        K = params["K"]
+        action = np.interp(unscaled_state / K - 1, self.obs, self.actions)
+        return (np.clip(action, -1.0, 1.0) + 1) * K
+
+    def save(self, path):
+        np.savez(
+            path,
+            obs=self.obs,
+            actions=self.actions,
+            error=np.nan if self.error is None else self.error,
+        )
+
+    @classmethod
+    def load(cls, path, env):
+        data = np.load(path)
+        error = float(data["error"])
+        return cls(env, data["obs"], data["actions"], error)
+
+
+def compile_policy(env, model, n=1001, tol=None):
+    """
+    Compile `model` (e.g. a trained SB3 agent) for an env with a 1-d
+    observation into a `lookup_policy` on `n` evenly spaced observations
+    in the observation space.
+
+    The approximation error is estimated as the largest difference
+    between the model and the table at the midpoints of the grid, stored
+    in `error` (in scaled action units); a warning is issued when it
+    exceeds `tol`.
+    """
+    if env.observation_space.shape != (1,):
+        raise ValueError("lookup policies need a 1-d observation space")
+    low = env.observation_space.low[0]
+    high = env.observation_space.high[0]
+    obs = np.linspace(low, high, num=n)
+    actions = _scaled_actions(env, model, obs)
+
+    mid = 0.5 * (obs[1:] + obs[:-1])
+    exact = _scaled_actions(env, model, mid)
+    error = float(np.max(np.abs(exact - np.interp(mid, obs, actions))))
+    if tol is not None and error > tol:
+        warnings.warn(
+            "lookup table error {:.3g} exceeds tol {:.3g}; "
+            "increase n".format(error, tol)
+        )
+    return lookup_policy(env, obs, actions, error)
+
+
+def _scaled_actions(env, model, obs):
+    K = env.params["K"]
+    return batch_policy_action(env, model, obs) / K - 1
@@ -0,0 +1,120 @@
+import numpy as np
+
+# activations by torch module class name; the evaluator never imports torch
+_ACTIVATIONS = {
+    "ReLU": lambda x: np.maximum(x, 0.0),
+    "Tanh": np.tanh,
+    "ELU": lambda x: np.where(x > 0, x, np.expm1(np.minimum(x, 0.0))),
+    "Sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "Identity": lambda x: x,
+}
+
+
+class numpy_policy:
+    """
+    Deterministic actor of a stable-baselines3 MlpPolicy evaluated with
+    NumPy only, from weights written by `export_policy`.  Provides the
+    `predict()` interface of the SB3 model (single or batched
+    observations) and `batch_action` for the batched simulators, so
+    evaluation workers never need to import torch.
+    """
+
+    def __init__(self, path, env=None, **kwargs):
+        data = np.load(path)
+        self.env = env
+        self.layers = [str(name) for name in data["layers"]]
+        self.weights = [
+            (
+                (data["weight_{}".format(i)], data["bias_{}".format(i)])
+                if name == "Linear"
+                else None
+            )
+            for i, name in enumerate(self.layers)
+        ]
+        self.output = str(data["output"])
+        self.low = data["low"]
+        self.high = data["high"]
+        self.obs_shape = tuple(data["obs_shape"])
+
+    def forward(self, obs):
+        x = np.asarray(obs, dtype=np.float32).reshape(
+            -1, int(np.prod(self.obs_shape))
+        )
+        for name, weights in zip(self.layers, self.weights):
+            if weights is None:
+                x = _ACTIVATIONS[name](x)
+            else:
+                x = x @ weights[0].T + weights[1]
+        if self.output == "clip":
+            return np.clip(x, self.low, self.high)
+        return self.low + 0.5 * (x + 1.0) * (self.high - self.low)
+
+    def predict(self, obs, state=None, deterministic=True, **kwargs):
+        obs = np.asarray(obs)
+        action = self.forward(obs)
+        if obs.shape == self.obs_shape:
+            action = action[0]
+        return action, None
+
+    def batch_action(self, unscaled_state, params):
+        K = params["K"]
+        action = self.forward(np.reshape(unscaled_state / K - 1, (-1, 1)))
+        return (np.clip(action[:, 0], -1.0, 1.0) + 1) * K
+
+
+def export_policy(model, path):
+    """
+    Save the deterministic actor of a trained A2C, PPO, SAC, TD3 or DDPG
+    model with an MlpPolicy to a small .npz file for `numpy_policy`.
+    """
+    policy = model.policy
+    if hasattr(policy, "mlp_extractor"):
+        # A2C / PPO: Gaussian mean, clipped to the action space by predict
+        modules = [
+            policy.mlp_extractor.shared_net,
+            policy.mlp_extractor.policy_net,
+            policy.action_net,
+        ]
+        output = "clip"
+    elif hasattr(policy.actor, "latent_pi"):
+        # SAC: squashed Gaussian mode, rescaled from [-1, 1]
+        modules = [policy.actor.latent_pi, policy.actor.mu, "Tanh"]
+        output = "unscale"
+    else:
+        # TD3 / DDPG: tanh output, rescaled from [-1, 1]
+        modules = [policy.actor.mu]
+        output = "unscale"
+
+    layers = []
+    arrays = {}
+    for module in _flatten(modules):
+        name = module if isinstance(module, str) else type(module).__name__
+        if name == "Linear":
+            i = len(layers)
+            arrays["weight_{}".format(i)] = _numpy(module.weight)
+            arrays["bias_{}".format(i)] = _numpy(module.bias)
+        elif name not in _ACTIVATIONS:
+            raise ValueError("unsupported layer: {}".format(name))
+        layers.append(name)
+
+    np.savez(
+        path,
+        layers=np.array(layers),
+        output=np.array(output),
+        low=model.action_space.low,
+        high=model.action_space.high,
+        obs_shape=np.array(model.observation_space.shape),
+        **arrays,
+    )
+
+
+def _flatten(modules):
+    for module in modules:
+        if type(module).__name__ == "Sequential":
+            yield from _flatten(module)
+        else:
+            yield module
+
+
+def _numpy(tensor):
+    return tensor.detach().cpu().numpy()
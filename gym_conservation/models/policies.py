@@ -1,5 +1,8 @@
 import numpy as np
 
+from gym_conservation.envs.batch_env import BatchEcologyEnv
+from gym_conservation.models.rollout import branch_rollouts
+
 
 class user_action:
     def __init__(self, env, **kwargs):
@@ -24,6 +27,12 @@ class fixed_action:
         action = self.env.get_action(float(unscaled_action))
         return action, state
 
+    def cache_key(self):
+        return ("fixed_action", float(self.fixed_action))
+
+    def batch_action(self, unscaled_state, params):
+        return np.full(np.shape(unscaled_state), float(self.fixed_action))
+
 
 class target_state:
     def __init__(self, env, target_state=1.0, **kwargs):
@@ -36,6 +45,12 @@ class target_state:
         action = self.env.get_action(float(unscaled_action))
         return action, obs
 
+    def cache_key(self):
+        return ("target_state", float(self.target_state))
+
+    def batch_action(self, unscaled_state, params):
+        return self.target_state - unscaled_state
+
 
 class target_a:
     def __init__(self, env, target_a=0.2, **kwargs):
@@ -43,7 +58,121 @@ class target_a:
         self.target_a = target_a
 
     def predict(self, obs, **kwargs):
-        delta = np.maximum(0, self.env.params["a"] - self.target_a)
+        delta = np.maximum(0, self.env.a - self.target_a)
         unscaled_action = delta * (2 * self.env.params["K"] * 100.0)
         action = self.env.get_action(float(unscaled_action))
         return action, obs
+
+    def cache_key(self):
+        return ("target_a", float(self.target_a))
+
+    def batch_action(self, unscaled_state, params):
+        delta = np.maximum(0, params["a"] - self.target_a)
+        return delta * (2 * params["K"] * 100.0)
+
+
+class mpc:
+    """
+    Model-predictive control: at every step, optimize a sequence of
+    `horizon` actions against the env's own dynamics and reward and take
+    its first action.
+
+    Sequences are parameterized by `n_knots` actions spread evenly over
+    the horizon and linearly interpolated between them, which keeps the
+    search low-dimensional however long the horizon.  Candidates,
+    `n_samples` at a time, are scored in a single batched rollout from a
+    snapshot of the env (`branch_rollouts`), with the population taken
+    from `obs`.  `method="cem"` runs `n_iter` rounds of the cross-entropy
+    method, refitting a Gaussian over the knots to the best `elite`
+    fraction; `method="shooting"` is random shooting, one round of uniform
+    draws.  Either way the previous step's plan, shifted by one,
+    warm-starts the search and is always among the candidates; the plan
+    is cleared at the start of each episode.
+
+    Plans use the noise-free (median) dynamics by default; with
+    `certainty_equivalent=False` each step draws one noise path from
+    `seed`, shared by all candidates.  `predict()` reads the env's current
+    state, so `env` must be the env being stepped.
+    """
+
+    def __init__(
+        self,
+        env,
+        horizon=150,
+        n_knots=10,
+        n_samples=100,
+        n_iter=2,
+        elite=0.1,
+        method="cem",
+        gamma=1.0,
+        certainty_equivalent=True,
+        seed=None,
+        **kwargs
+    ):
+        if method not in ("cem", "shooting"):
+            raise ValueError("method must be 'cem' or 'shooting'")
+        self.env = env
+        self.horizon = horizon
+        self.n_samples = n_samples
+        self.n_iter = n_iter if method == "cem" else 1
+        self.n_elite = max(2, int(elite * n_samples))
+        self.method = method
+        self.gamma = gamma
+        self.certainty_equivalent = certainty_equivalent
+        self.rng = np.random.default_rng(seed)
+        # (horizon, n_knots) linear interpolation from knots to actions,
+        # and its pseudo-inverse to fit knots to a shifted plan
+        n_knots = min(n_knots, horizon)
+        knots = np.linspace(0, horizon - 1, n_knots)
+        eye = np.eye(n_knots)
+        self.basis = np.stack(
+            [np.interp(np.arange(horizon), knots, e) for e in eye], axis=1
+        )
+        self.fit = np.linalg.pinv(self.basis)
+        self.batch = None
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the warm-start plan, e.g. between episodes.
+        """
+        self.plan = np.full(self.horizon, -1.0)
+
+    def predict(self, obs, **kwargs):
+        env = getattr(self.env, "unwrapped", self.env)
+        if env.years_passed == 0:
+            # a new episode: don't warm-start from the last one
+            self.reset()
+        snapshot = env.get_snapshot(noise=False)
+        snapshot.dynamic.x = float(env.get_unscaled_state(np.ravel(obs)))
+        if self.batch is None:
+            self.batch = BatchEcologyEnv(env, n_envs=self.n_samples)
+        noise = np.zeros(self.horizon)
+        if not self.certainty_equivalent:
+            noise = self.rng.standard_normal(self.horizon)
+
+        shifted = np.append(self.plan[1:], self.plan[-1])
+        mean = self.fit @ shifted
+        std = np.full(len(mean), 0.5)
+        best, best_return = shifted, -np.inf
+        for _ in range(self.n_iter):
+            shape = (self.n_samples, len(mean))
+            if self.method == "cem":
+                knots = mean + std * self.rng.standard_normal(shape)
+            else:
+                knots = self.rng.uniform(-1.0, 1.0, shape)
+            knots[0] = mean
+            samples = np.clip(knots @ self.basis.T, -1.0, 1.0)
+            samples[1] = best
+            returns = branch_rollouts(
+                self.batch, samples, snapshot, noise=noise, gamma=self.gamma
+            )
+            i = np.argmax(returns)
+            if returns[i] > best_return:
+                best, best_return = samples[i].copy(), returns[i]
+            elite = knots[np.argpartition(returns, -self.n_elite)]
+            elite = elite[-self.n_elite :]
+            mean = elite.mean(axis=0)
+            std = elite.std(axis=0) + 0.01
+        self.plan = best
+        return float(best[0]), obs
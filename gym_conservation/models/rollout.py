@@ -0,0 +1,154 @@
+import numpy as np
+
+from gym_conservation.envs.batch_env import BatchEcologyEnv
+from gym_conservation.envs.shared_env import batch_policy_action
+
+
+class PathNoise:
+    """
+    Replays pre-drawn standard normal noise paths, one (reps,) column per
+    time step, in place of a BatchEcologyEnv's random number generator.
+    """
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.t = 0
+
+    def standard_normal(self, size=None):
+        # a copy: callers may scale the draws in place
+        z = self.paths[:, self.t].copy()
+        self.t += 1
+        return np.reshape(z, size)
+
+
+def rollout_policy(
+    env, policy, reps=1, Tmax=None, seed=None, trajectories=False
+):
+    """
+    Run `reps` episodes of a policy as a single time loop over arrays.
+    Policies exposing `batch_action(unscaled_state, params)`, such as
+    `fixed_action`, `target_state` or `target_a`, are evaluated directly;
+    other models (e.g. SB3 agents) get one batched `predict()` per step.
+
+    `env` may be an env id, a scalar env or a BatchEcologyEnv. Returns the
+    per-episode returns; with `trajectories=True` also returns a dict of
+    (reps, Tmax + 1) arrays of state, action and reward (NaN once an
+    episode has ended) and the episode lengths.
+    """
+    if isinstance(env, BatchEcologyEnv):
+        batch = env
+    else:
+        batch = BatchEcologyEnv(env, n_envs=reps, seed=seed, autoreset=False)
+    reps = batch.n_envs
+    batch.autoreset = False
+    if Tmax is None:
+        Tmax = batch.Tmax
+    n_steps = Tmax + 1
+
+    returns = np.zeros(reps)
+    length = np.zeros(reps, dtype=np.int64)
+    alive = np.ones(reps, dtype=bool)
+    if trajectories:
+        shape = (reps, n_steps)
+        traj = {
+            "state": np.full(shape, np.nan),
+            "action": np.full(shape, np.nan),
+            "reward": np.full(shape, np.nan),
+        }
+
+    batch.reset()
+    for t in range(n_steps):
+        x = batch.get_unscaled_state(batch.state)
+        if hasattr(policy, "batch_action"):
+            unscaled_action = policy.batch_action(x, batch.params)
+        else:
+            unscaled_action = batch_policy_action(
+                batch.env, policy, batch.state
+            )
+        _, reward, done, _ = batch.step(batch.get_action(unscaled_action))
+        returns += np.where(alive, reward, 0.0)
+        length += alive
+        if trajectories:
+            traj["state"][alive, t] = x[alive]
+            traj["action"][alive, t] = batch.unscaled_action[alive]
+            traj["reward"][alive, t] = reward[alive]
+        alive &= ~done
+        if not alive.any():
+            break
+
+    if trajectories:
+        traj["length"] = length
+        return returns, traj
+    return returns
+
+
+def simulate_layout(traj, Tmax):
+    """
+    rollout_policy trajectories in the (reps, Tmax) layout of simulate_mdp
+    and TrajectoryStore runs: the state at time t with the action and
+    reward of the step that led to it (0 at t = 0).
+    """
+    out = {"state": traj["state"][:, :Tmax]}
+    for column in ("action", "reward"):
+        lagged = np.zeros_like(out["state"])
+        lagged[:, 1:] = traj[column][:, : Tmax - 1]
+        out[column] = lagged
+    return out
+
+
+def branch_rollouts(
+    env, actions, snapshot=None, seed=None, noise=None, gamma=1.0
+):
+    """
+    Expand one snapshot of a scalar env into K futures, one per row of
+    `actions`, a (K, H) array of open-loop action sequences (or a (K,)
+    array of single actions) on the scaled [-1, 1] scale, and step them
+    all together as one BatchEcologyEnv.  `snapshot` defaults to the env's
+    current state (`env.get_snapshot()`).
+
+    Futures draw independent noise from `seed`, or replay `noise`: an
+    (H,) array of standard normals shared by all futures (common random
+    numbers, so that differences between futures come from the actions
+    alone) or a (K, H) array of one path per future.
+
+    `env` may also be a BatchEcologyEnv with K copies, which is reused;
+    its random number generator and autoreset setting are left as found.
+    Returns the (K,) discounted returns; rewards stop once a future
+    reaches Tmax or extinction.  The batch is left at the end of the
+    futures, so `batch.unscaled_state` etc. hold where they ended up.
+    """
+    actions = np.asarray(actions, dtype=np.float64)
+    if actions.ndim == 1:
+        actions = actions[:, None]
+    n, horizon = actions.shape
+    if isinstance(env, BatchEcologyEnv):
+        batch = env
+        if snapshot is None:
+            raise ValueError("a snapshot is needed to branch a batch")
+        if seed is not None:
+            batch.seed(seed)
+    else:
+        if snapshot is None:
+            snapshot = env.get_snapshot(noise=False)
+        batch = BatchEcologyEnv(env, n_envs=n, seed=seed)
+    rng, autoreset = batch.rng, batch.autoreset
+    batch.autoreset = False
+    batch.restore(snapshot)
+    if noise is not None:
+        noise = np.asarray(noise, dtype=np.float64)
+        batch.rng = PathNoise(np.broadcast_to(noise, (n, horizon)))
+
+    returns = np.zeros(n)
+    alive = ~batch.done
+    discount = 1.0
+    try:
+        for t in range(horizon):
+            _, reward, done, _ = batch.step(actions[:, t])
+            returns += np.where(alive, discount * reward, 0.0)
+            alive &= ~done
+            discount *= gamma
+            if not alive.any():
+                break
+    finally:
+        batch.rng, batch.autoreset = rng, autoreset
+    return returns
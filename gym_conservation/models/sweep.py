@@ -0,0 +1,163 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from pandas import DataFrame
+
+from gym_conservation.envs.batch_env import BatchEcologyEnv
+from gym_conservation.envs.store import TrajectoryStore
+from gym_conservation.models.rollout import rollout_policy, simulate_layout
+
+
+def sweep(
+    env_ids,
+    policies,
+    env_kwargs=None,
+    seeds=4,
+    reps=100,
+    seed=None,
+    workers=None,
+    chunksize=None,
+    store=None,
+):
+    """
+    Evaluate every combination of env id, env kwargs, policy and seed on a
+    process pool and return a tidy summary table, one row per task.
+
+    `policies` maps names to factories `f(env) -> policy`, which must be
+    picklable, e.g. `functools.partial(fixed_action, fixed_action=0.3)`.
+    `seeds` is either a list of integer seeds or a number of independent
+    streams spawned from `seed`; each task runs `reps` episodes with
+    rollout_policy on its seed's stream, so results do not depend on how
+    the tasks are scheduled across workers, and policies evaluated with the
+    same seed see the same noise.
+
+    Per-episode returns come back through a shared memory block.  If a
+    TrajectoryStore path is given as `store`, each task also writes its
+    trajectories there as run "task-<i>", with the task as run params, in
+    the store's simulate_mdp layout.
+    """
+    if isinstance(env_ids, str):
+        env_ids = [env_ids]
+    if env_kwargs is None:
+        env_kwargs = [{}]
+    if isinstance(seeds, int):
+        seeds = np.random.SeedSequence(seed).spawn(seeds)
+    tasks = [
+        dict(env_id=env_id, kwargs=kwargs, policy=name, seed=s)
+        for env_id, kwargs, name, s in itertools.product(
+            env_ids, env_kwargs, policies, seeds
+        )
+    ]
+    for i, task in enumerate(tasks):
+        task.update(index=i, reps=reps, factory=policies[task["policy"]])
+    if store is not None:
+        horizons = {}
+        runs = TrajectoryStore(store)
+        with runs.deferred_index():
+            for task in tasks:
+                key = (task["env_id"], repr(task["kwargs"]))
+                if key not in horizons:
+                    env = BatchEcologyEnv(task["env_id"], **task["kwargs"])
+                    horizons[key] = env.Tmax
+                task["store"] = store
+                _create_run(runs, task, horizons[key])
+
+    if workers is None:
+        workers = os.cpu_count()
+    workers = min(workers, len(tasks))
+    if chunksize is None:
+        chunksize = max(1, len(tasks) // (4 * workers))
+
+    shm = shared_memory.SharedMemory(
+        create=True, size=max(1, len(tasks) * reps * 8)
+    )
+    try:
+        for task in tasks:
+            task["shm"] = shm.name
+        if workers <= 1:
+            list(map(_run_task, tasks))
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                list(pool.map(_run_task, tasks, chunksize=chunksize))
+        returns = np.ndarray(
+            (len(tasks), reps), dtype=np.float64, buffer=shm.buf
+        ).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    rows = []
+    for task, r in zip(tasks, returns):
+        seed_label = task["seed"]
+        if isinstance(seed_label, np.random.SeedSequence):
+            seed_label = seed_label.spawn_key[-1]
+        rows.append(
+            dict(
+                env_id=task["env_id"],
+                **task["kwargs"],
+                policy=task["policy"],
+                seed=seed_label,
+                reps=reps,
+                mean=r.mean(),
+                std=r.std(ddof=1) if reps > 1 else 0.0,
+                se=r.std(ddof=1) / np.sqrt(reps) if reps > 1 else 0.0,
+                min=r.min(),
+                max=r.max(),
+            )
+        )
+    return DataFrame(rows)
+
+
+def _create_run(store, task, Tmax):
+    params = dict(env_id=task["env_id"], policy=task["policy"])
+    params.update(task["kwargs"])
+    if not isinstance(task["seed"], np.random.SeedSequence):
+        params["seed"] = task["seed"]
+    run = store.create_run(
+        "task-{:05d}".format(task["index"]),
+        task["reps"],
+        Tmax,
+        params,
+    )
+    # the rows are claimed here so that workers never write the index
+    run.reserve(task["reps"])
+
+
+def _run_task(task):
+    """
+    Worker: run one task and write its returns into the shared block.
+    """
+    batch = BatchEcologyEnv(
+        task["env_id"],
+        n_envs=task["reps"],
+        seed=task["seed"],
+        autoreset=False,
+        **task["kwargs"],
+    )
+    policy = task["factory"](batch.env)
+    store = task.get("store")
+    out = rollout_policy(batch, policy, trajectories=store is not None)
+    if store is not None:
+        returns, traj = out
+        run = TrajectoryStore(store)["task-{:05d}".format(task["index"])]
+        traj = simulate_layout(traj, run.Tmax)
+        for column in run.columns:
+            run[column][:] = traj[column]
+        run.flush()
+    else:
+        returns = out
+
+    shm = shared_memory.SharedMemory(name=task["shm"])
+    try:
+        block = np.ndarray(
+            (task["index"] + 1, task["reps"]),
+            dtype=np.float64,
+            buffer=shm.buf,
+        )
+        block[task["index"]] = returns
+        del block
+    finally:
+        shm.close()
@@ -1,9 +1,13 @@
 import gym
-from stable_baselines3 import PPO
+import numpy as np
+from stable_baselines3 import A2C, PPO, SAC, TD3
 from stable_baselines3.common.env_checker import check_env
 from stable_baselines3.common.evaluation import evaluate_policy
 from stable_baselines3.common.monitor import Monitor
 
+from gym_conservation.models.lookup import compile_policy, lookup_policy
+from gym_conservation.models.numpy_policy import export_policy, numpy_policy
+
 
 def test_ppo():
     env = gym.make("conservation-v2")
@@ -11,8 +15,40 @@ def test_ppo():
     model = PPO("MlpPolicy", env, verbose=0)
     model.learn(total_timesteps=200)
     df = env.simulate(model)
+    df_batch = env.simulate(model, reps=3, batch=True)
+    assert df_batch.shape == (3 * env.Tmax, 5)
     env.plot(df, "PPO-test.png")
     mean_reward, std_reward = evaluate_policy(
         model, Monitor(env), n_eval_episodes=5
     )
     env.plot_policy(df, "PPO-policy.png")
+
+
+def test_compile_policy(tmp_path):
+    env = gym.make("conservation-v2", file=None)
+    model = PPO("MlpPolicy", env, verbose=0)
+    table = compile_policy(env, model, n=2001, tol=1e-2)
+    assert table.error < 1e-2
+    obs = np.random.uniform(-1, 1, size=(100, 1)).astype(np.float32)
+    action, _ = model.predict(obs, deterministic=True)
+    assert np.allclose(table.predict(obs)[0], action, atol=1e-2)
+
+    table.save(str(tmp_path / "table.npz"))
+    table = lookup_policy.load(str(tmp_path / "table.npz"), env)
+    df = env.simulate(table, reps=5, batch=True)
+
+
+def test_numpy_policy(tmp_path):
+    env = gym.make("conservation-v5", file=None)
+    obs = np.random.uniform(-1, 1, size=(100, 1)).astype(np.float32)
+    for algo, kwargs in [(PPO, {}), (A2C, {}), (TD3, {}), (SAC, {})]:
+        if algo in (TD3, SAC):
+            kwargs = dict(buffer_size=100)
+        model = algo("MlpPolicy", env, verbose=0, **kwargs)
+        path = str(tmp_path / "policy.npz")
+        export_policy(model, path)
+        policy = numpy_policy(path, env)
+        action, _ = model.predict(obs, deterministic=True)
+        assert np.allclose(policy.predict(obs)[0], action, atol=1e-5)
+        assert policy.predict(obs[0])[0].shape == (1,)
+    df = env.simulate(policy, reps=3, batch=True)
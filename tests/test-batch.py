@@ -0,0 +1,54 @@
+import gym
+import numpy as np
+from stable_baselines3 import PPO
+
+from gym_conservation.envs.batch_env import BatchEcologyEnv
+from gym_conservation.envs.growth_models import (
+    population_model,
+    population_model_batch,
+)
+from gym_conservation.envs.vec_env import EcologyVecEnv
+
+params = {
+    "r": 0.7,
+    "K": 1.5,
+    "M": 1.2,
+    "C": 0.5,
+    "theta": 3.0,
+    "q": 3,
+    "b": 0.15,
+    "a": 0.2,
+    "sigma": 0.0,
+}
+
+
+def test_batch_growth():
+    x = np.linspace(0.0, 2.0, 11)
+    for name, f in population_model_batch.items():
+        scalar = [population_model[name](xi, params)[0] for xi in x]
+        np.testing.assert_allclose(f(x, params), scalar)
+
+    # per-element parameters, explicit generator and output buffer
+    p = dict(params, sigma=np.full(11, 0.1), r=np.linspace(0.1, 1.0, 11))
+    out = np.empty(11)
+    y = population_model_batch["ricker"](x, p, np.random.default_rng(1), out)
+    assert y is out
+    z = population_model_batch["ricker"](x, p, np.random.default_rng(1))
+    np.testing.assert_array_equal(y, z)
+
+
+def test_batch_env():
+    for env_id in ["conservation-v0", "conservation-v3", "conservation-v5"]:
+        env = gym.make(env_id, file=None)
+        batch = BatchEcologyEnv(env_id, n_envs=3, autoreset=False)
+        env.reset()
+        batch.reset()
+        for t in range(20):
+            obs, reward, done, _ = env.step(np.array([-0.9]))
+            state, rewards, dones, _ = batch.step(np.full(3, -0.9))
+            np.testing.assert_allclose(state, np.ravel(obs)[0])
+            np.testing.assert_allclose(rewards, np.ravel(reward)[0])
+
+    vec_env = EcologyVecEnv("conservation-v6", n_envs=4, seed=0)
+    model = PPO("MlpPolicy", vec_env, n_steps=64, batch_size=64, verbose=0)
+    model.learn(total_timesteps=1024)
@@ -0,0 +1,20 @@
+import json
+
+from gym_conservation.benchmark import compare, step_throughput
+
+
+def test_compare(tmp_path):
+    rate = step_throughput("conservation-v2", n_steps=100, repeat=1)
+    base = [
+        dict(name="step", value=rate, unit="steps/s", better="higher"),
+        dict(name="sim", value=1.0, unit="s", better="lower"),
+    ]
+    new = [
+        dict(name="step", value=rate / 2, unit="steps/s", better="higher"),
+        dict(name="sim", value=1.05, unit="s", better="lower"),
+    ]
+    for name, results in [("base", base), ("new", new)]:
+        with open(str(tmp_path / name), "w") as f:
+            json.dump(dict(meta={}, results=results), f)
+    regressions = compare(str(tmp_path / "base"), str(tmp_path / "new"))
+    assert regressions == ["step"]
@@ -1,8 +1,13 @@
 import gym
 import numpy as np
+import pytest
 from stable_baselines3.common.env_checker import check_env
 
 import gym_conservation
+from gym_conservation.envs import ModelPosterior, ModelUncertainty
+from gym_conservation.envs.growth_models import lognormal_draw
+from gym_conservation.envs.instrument import instrument_env
+from gym_conservation.envs.recorder import load_recording
 from gym_conservation.models.policies import user_action
 
 np.random.seed(42)
@@ -49,3 +54,156 @@ def test_user():
     model = user_action(env)
     # df = env.simulate(model)
     # env.plot(df, "user-may-test.png")
+
+
+def test_render(tmp_path):
+    env = gym.make("conservation-v2", file=str(tmp_path / "render.csv"))
+    assert list(tmp_path.iterdir()) == []
+    # nothing allocated or named until the env actually renders
+    assert env.recorder.buffer is None and env.recorder.path is None
+    env.recorder.capacity = 16
+    env.reset()
+    for t in range(40):
+        env.step(np.array([0.0]))
+        env.render()
+    env.close()
+    df = load_recording(env.recorder.path)
+    assert list(df.columns) == ["time", "state", "action", "reward"]
+    assert np.array_equal(df.time, np.arange(1, 41))
+
+
+def test_v7():
+    env = gym.make("conservation-v7", reps=5, file=None)
+    env.reset()
+    state, reward, done, info = env.step(np.array([0.0]))
+    assert state.shape == (5,)
+
+
+def test_instrument():
+    env = gym.make("conservation-v5", file=None)
+    profiler = instrument_env(env)
+    for episode in range(2):
+        env.reset()
+        done = False
+        while not done:
+            obs, reward, done, info = env.step(np.array([0.0]))
+    summary = profiler.summary()
+    assert summary["phases"]["population_draw"]["calls"] == 2 * 501
+    assert summary["terminations"] == {"extinction": 0, "Tmax": 2}
+    assert summary["phases"]["step"]["allocs"] is None
+    assert "wrappers" in profiler.report().index
+
+    instrument_env(env, enabled=False)
+    env.reset()
+    env.step(np.array([0.0]))
+    assert profiler.calls["step"] == 2 * 501
+
+
+def test_seed():
+    def run(seed, block_size):
+        env = gym.make("conservation-v6", file=None)
+        env.unwrapped.seed(seed, block_size=block_size)
+        env.reset()
+        return [env.step(np.array([0.0]))[0] for t in range(50)]
+
+    assert np.array_equal(run(1, 4096), run(1, 4096))
+    assert np.array_equal(run(1, 4096), run(1, 7))
+    assert not np.array_equal(run(1, 4096), run(2, 4096))
+    # blocks grow from a small first block
+    env = gym.make("conservation-v6", file=None).unwrapped
+    env.reset()
+    env.step(np.array([0.0]))
+    assert env.noise.block.size == 32
+
+
+def test_model_uncertainty_step():
+    env = gym_conservation.envs.ModelUncertainty(file=None)
+    env.seed(0)
+    env.reset()
+    for _ in range(5):
+        obs, reward, done, _ = env.step(np.array([-0.9]))
+        assert isinstance(env.unscaled_state, float)
+    assert obs.shape == (1,) and not done
+
+
+def test_scalar_step():
+    for env_id in ["conservation-v0", "conservation-v2", "conservation-v5"]:
+        env = gym.make(env_id, file=None).unwrapped
+        obs = env.reset()
+        next_obs, reward, done, _ = env.step(np.array([0.2]))
+        # state is a plain float; observations are copies of the buffer
+        assert isinstance(env.unscaled_state, float)
+        assert isinstance(reward, float)
+        assert next_obs.shape == (1,) and next_obs is not env.state
+        assert obs[0] == env.init_state / env.K - 1
+        assert np.isclose(next_obs[0], env.unscaled_state / env.K - 1)
+
+
+def test_model_posterior():
+    env = ModelUncertainty(file=None)
+    env.seed(0)
+    env.reset()
+    post = ModelPosterior(env)
+    assert np.allclose(post.posterior, 0.2)
+    for t in range(5):
+        x = env.unscaled_state
+        env.step(np.array([-0.9]))
+        ll = post.log_likelihood(x + env.unscaled_action, env.unscaled_state)
+        assert ll.shape == (5,)
+        post.update(x + env.unscaled_action, env.unscaled_state)
+    assert post.models[np.argmax(post.posterior)] == env.model
+    assert np.isclose(post.posterior.sum(), 1)
+    assert post.step(np.array([0.3, 0.5])).shape == (2, 5)
+
+
+def test_params():
+    env = gym.make("conservation-v5", file=None).unwrapped
+    other = gym.make("conservation-v5", file=None).unwrapped
+    assert env.params == other.params and env.dynamic is not other.dynamic
+    with pytest.raises(AttributeError):
+        env.params.a = 0.1
+    assert env.params.replace(a=0.1).a == 0.1 and env.params.a == 0.19
+    env.reset()
+    env.step(np.array([-1.0]))
+    # "a" drifts in the env's dynamic state, not in the shared params
+    assert env.params["a"] == 0.19 and env.a > 0.19
+    assert other.a == 0.19
+    env.reset()
+    assert env.a == 0.19
+    # a replaced params record takes effect from the next episode
+    env = gym_conservation.envs.May(file=None)
+    env.params = env.params.replace(a=0.5, x0=0.3)
+    env.reset()
+    assert env.a == 0.5 and env.unscaled_state == 0.3
+    env.step(np.array([-1.0]))
+    assert env.unscaled_state < 0.3
+    env.params = env.params.replace(sigma=0.3, r=0.5)
+    env.reset()
+    assert env.sigma == 0.3 and env.r == 0.5 and not env.deterministic
+    # dicts become the record type with exactly their keys
+    params = dict(r=0.3, K=1, sigma=0.0, x0=0.1, cost=2.0, benefit=1.0, C=0.5)
+    env = gym_conservation.envs.BaseEcologyEnv(params=params, file=None)
+    assert type(env.params).__name__ == "AllenParams"
+
+
+def test_snapshot():
+    for env_id in ["conservation-v6", "conservation-v7"]:
+        env = gym.make(env_id, file=None).unwrapped
+        env.seed(1)
+        env.reset()
+        env.step(np.array([-0.8]))
+        snapshot = env.get_snapshot()
+        future = [env.step(np.array([-0.5]))[0] for _ in range(5)]
+        env.restore(snapshot)
+        assert np.allclose(
+            future, [env.step(np.array([-0.5]))[0] for _ in range(5)]
+        )
+    assert env.years_passed == 6
+
+
+def test_lognormal_draw_global_seed():
+    mu = np.zeros(100)
+    np.random.seed(4)
+    x = lognormal_draw(mu, 0.2)
+    np.random.seed(4)
+    assert np.array_equal(x, lognormal_draw(mu, 0.2))
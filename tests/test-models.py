@@ -1,10 +1,47 @@
+import math
+from functools import partial
+
 import gym
+import numpy as np
+import pytest
 from stable_baselines3.common.env_checker import check_env
 from stable_baselines3.common.evaluation import evaluate_policy
 from stable_baselines3.common.monitor import Monitor
 
 import gym_conservation
-from gym_conservation.models.policies import fixed_action, target_state
+from gym_conservation.envs.batch_env import BatchEcologyEnv
+from gym_conservation.envs.shared_env import simulate_mdp_batch
+from gym_conservation.envs.store import TrajectoryStore
+from gym_conservation.models.bifurcation import (
+    basins,
+    equilibria,
+    tipping_points,
+)
+from gym_conservation.models.cache import KernelCache
+from gym_conservation.models.dp import (
+    DiscreteModel,
+    dp_policy,
+    policy_iteration,
+    solve_mdp,
+    value_iteration,
+)
+from gym_conservation.models.evaluation import (
+    _pair_means,
+    _t_ppf,
+    compare_policies,
+    evaluate,
+    evaluate_sequential,
+    noise_paths,
+    rollout_cache,
+)
+from gym_conservation.models.policies import (
+    fixed_action,
+    mpc,
+    target_a,
+    target_state,
+)
+from gym_conservation.models.rollout import branch_rollouts, rollout_policy
+from gym_conservation.models.sweep import sweep
 
 
 def test_fixed_action():
@@ -23,3 +60,316 @@ def test_target_state():
     df = env.simulate(model, reps=2)
     env.plot(df, "fixed_state-test.png")
     evaluate_policy(model, Monitor(env), n_eval_episodes=50)
+
+
+def test_rollout_policy():
+    env = gym.make("conservation-v5", file=None)
+    model = target_a(env, 0.18)
+    returns = rollout_policy(env, model, reps=3)
+    obs, total, done = env.reset(), 0.0, False
+    while not done:
+        action, _ = model.predict(obs)
+        obs, reward, done, _ = env.step(np.array([action]))
+        total += reward
+    assert np.allclose(returns, total)
+
+    model = fixed_action(env, 0.5)
+    returns, traj = rollout_policy(
+        "conservation-v6", model, reps=10, trajectories=True
+    )
+    assert traj["state"].shape == (10, env.Tmax + 1)
+    assert np.allclose(np.nansum(traj["reward"], axis=1), returns)
+
+
+def test_compare_policies():
+    z = noise_paths(100, 20, seed=0, antithetic=True, qmc=True)
+    assert z.shape == (100, 21)
+    assert np.allclose(z[:50], -z[50:])
+    # odd reps: the middle path has no partner and is dropped
+    assert np.allclose(_pair_means(noise_paths(5, 3, antithetic=True), 1), 0)
+    assert abs(z.mean()) < 1e-12 and abs(z[:50].std() - 1) < 0.05
+    # Latin hypercube: one draw per stratum in every time step
+    n = 50
+    z = noise_paths(n, 20, seed=0, qmc=True)
+    Phi = np.vectorize(lambda x: 0.5 * (1 + math.erf(x / math.sqrt(2))))
+    strata = np.floor(Phi(z) * n)
+    for t in range(z.shape[1]):
+        assert np.array_equal(np.sort(strata[:, t]), np.arange(n))
+
+    env = gym.make("conservation-v6", file=None)
+    policies = {
+        "a": fixed_action(env, 0.2),
+        "b": fixed_action(env, 0.2),
+        "c": target_state(env, 0.8),
+    }
+    df = compare_policies(env.unwrapped, policies, reps=20, seed=1)
+    assert list(df.policy) == ["a", "b", "c"]
+    # identical policies on common noise differ by exactly zero
+    assert df["diff"][1] == 0 and df["diff_se"][1] == 0
+    assert df["diff_low"][2] <= df["diff"][2] <= df["diff_high"][2]
+
+
+def test_simulate_batch():
+    env = gym.make("conservation-v3", file=None)
+    model = target_state(env, 0.8)
+    df = env.simulate(model, reps=2)
+    df_batch = env.simulate(model, reps=2, batch=True)
+    assert np.allclose(df.values, df_batch.values)
+
+
+def test_policyfn():
+    env = gym.make("conservation-v5", file=None)
+    df = env.policyfn(target_state(env, 0.8), reps=2)
+    assert df.shape == (100, 3)
+    assert np.allclose(df.action, np.clip(0.8 - df.state, 0, 2 * env.K))
+
+    # env.K, as ModelUncertainty's params are keyed by model
+    env = gym_conservation.envs.ModelUncertainty(file=None)
+    assert env.policyfn(fixed_action(env, 0.3)).shape == (50, 3)
+
+    env = gym.make("conservation-v5", file=None)
+    grids = {"a": np.linspace(0.1, 0.3, 7)}
+    df = env.policy_surface(target_a(env, 0.2), grids, n=11)
+    assert df.shape == (77, 3)
+    assert np.allclose(df.action[df.a <= 0.2], 0.0)
+    assert np.all(df.action[df.a > 0.2] > 0.0)
+
+
+def test_store(tmp_path):
+    env = gym.make("conservation-v6", file=None)
+    model = target_a(env, 0.18)
+    store = TrajectoryStore(str(tmp_path))
+    run = store.create_run("v6", reps=10, Tmax=env.Tmax, params=env.params)
+    simulate_mdp_batch(env, model, reps=4, run=run)
+    simulate_mdp_batch(env, model, reps=4, run=run)
+
+    run = TrajectoryStore(str(tmp_path))["v6"]
+    assert run.n == 8
+    assert run["state"].shape == (8, env.Tmax)
+    assert np.array_equal(run.replicate(5).state, run["state"][5])
+    env.plot(run, str(tmp_path / "store.png"))
+
+
+def test_plot_aggregate(tmp_path):
+    env = gym.make("conservation-v6", file=None)
+    df = env.simulate(fixed_action(env, 0.3), reps=200, batch=True)
+    env.plot(df, str(tmp_path / "fan.png"), aggregate=True, n_traces=10)
+
+
+def test_dp():
+    env = gym.make("conservation-v0", sigma=0.1, file=None)
+    mdp = DiscreteModel(env, n_states=100)
+    assert np.allclose(mdp.prob.sum(axis=1), 1.0)
+    policy, V = value_iteration(mdp, gamma=0.95)
+    policy2, V2 = policy_iteration(mdp, gamma=0.95)
+    assert np.allclose(V, V2, atol=1e-4)
+
+    model = dp_policy(env, mdp, policy)
+    best = max(
+        rollout_policy(env, fixed_action(env, a), reps=50, seed=0).mean()
+        for a in np.linspace(0, 2, 11)
+    )
+    assert rollout_policy(env, model, reps=50, seed=0).mean() > best
+    df = env.simulate(model)
+
+    # actions and drift in a are not modelled by the discretization
+    for env_id in ["conservation-v3", "conservation-v5", "conservation-v6"]:
+        with pytest.raises(ValueError):
+            solve_mdp(gym.make(env_id, file=None))
+
+
+def test_kernel_cache(tmp_path):
+    cache = KernelCache(str(tmp_path), max_bytes=10**6)
+    env = gym.make("conservation-v2", sigma=0.1, file=None)
+    mdp = DiscreteModel(env, n_states=50, cache=cache)
+    cached = DiscreteModel(env, n_states=50, cache=cache)
+    assert isinstance(cached.prob, np.memmap)
+    assert np.array_equal(mdp.prob, cached.prob)
+    assert np.allclose(mdp.reward, cached.reward)
+    assert len(cache.entries()) == 1
+
+    for sigma in [0.2, 0.3, 0.4]:
+        env = gym.make("conservation-v2", sigma=sigma, file=None)
+        DiscreteModel(env, n_states=200, cache=cache)
+    assert sum(size for _, size, _ in cache.entries()) <= 10**6
+
+
+def test_sweep(tmp_path):
+    policies = {
+        "none": partial(fixed_action, fixed_action=0.0),
+        "fixed": partial(fixed_action, fixed_action=0.2),
+    }
+    kwargs = [{}, {"sigma": 0.0}]
+    df = sweep(
+        "conservation-v6",
+        policies,
+        kwargs,
+        seeds=2,
+        reps=5,
+        seed=0,
+        workers=2,
+        store=str(tmp_path),
+    )
+    assert df.shape[0] == 8
+    assert set(df.policy) == {"none", "fixed"}
+    # same seed, same results, whichever worker ran the task
+    again = sweep(
+        "conservation-v6",
+        policies,
+        kwargs,
+        seeds=2,
+        reps=5,
+        seed=0,
+        workers=1,
+    )
+    assert np.allclose(df["mean"], again["mean"])
+    runs = TrajectoryStore(str(tmp_path))
+    assert list(runs.runs().n) == [5] * 8
+    # same layout as simulate_mdp_batch writes: task 4 is the noise-free
+    # "none" policy
+    env = gym.make("conservation-v6", sigma=0.0, file=None)
+    run = runs.create_run("direct", reps=5, Tmax=env.Tmax)
+    simulate_mdp_batch(env, fixed_action(env, 0.0), reps=5, run=run)
+    for column in run.columns:
+        assert np.allclose(runs["task-00004"][column], run[column])
+
+
+def test_bifurcation():
+    env = gym.make("conservation-v5", file=None)
+    a = np.linspace(0, 0.4, 401)
+    df = equilibria(env, {"a": a})
+    # without harvest, May's model settles at carrying capacity M
+    assert np.allclose(df[(df.a == 0) & df.stable].x, 1.2)
+    tips = tipping_points(env, {"a": a})
+    assert np.allclose(tips.a, [0.1655, 0.2135])
+    assert list(tips.after) == [2, 1]
+    final, converged = basins(env, {"a": [0.2]}, [0.05, 1.0])
+    assert converged.all()
+    assert final[0, 0] < 0.2 and final[0, 1] > 0.7
+
+
+def test_evaluate_deterministic():
+    env = gym.make("conservation-v5", file=None)
+    assert env.unwrapped.deterministic
+    model = target_a(env, 0.18)
+    rollout_cache.clear()
+    mean, std = evaluate(model, env, n_eval_episodes=50)
+    assert len(rollout_cache) == 1
+    rewards, lengths = evaluate(
+        model, env, n_eval_episodes=5, return_episode_rewards=True
+    )
+    assert np.allclose(rewards, mean) and lengths == [env.Tmax + 1] * 5
+    assert np.isclose(rollout_policy(env, model)[0], mean)
+    # stochastic envs run every episode
+    env = gym.make("conservation-v6", file=None)
+    assert not env.unwrapped.deterministic
+    rewards, _ = evaluate(
+        fixed_action(env, 0.2), env, 3, return_episode_rewards=True
+    )
+    assert len(set(rewards)) == 3 and len(rollout_cache) == 1
+    # policies that do not declare themselves deterministic run every
+    # episode, even on a deterministic env
+    env = gym.make("conservation-v5", Tmax=5, file=None)
+    rewards, _ = evaluate(
+        mpc(env, horizon=3, n_samples=20, certainty_equivalent=False, seed=0),
+        env,
+        3,
+        return_episode_rewards=True,
+    )
+    assert len(set(rewards)) == 3
+
+
+def test_branch_rollouts():
+    env = gym.make("conservation-v5", file=None).unwrapped
+    env.reset()
+    env.step(np.array([-0.9]))
+    snapshot = env.get_snapshot()
+    actions = np.repeat(np.linspace(-1, -0.5, 3)[:, None], 10, axis=1)
+    returns = branch_rollouts(env, actions)
+    for k in range(3):
+        env.restore(snapshot)
+        total = sum(env.step(actions[k, t : t + 1])[1] for t in range(10))
+        assert np.isclose(returns[k], total)
+    # common noise: identical actions give identical futures
+    env = gym.make("conservation-v6", file=None).unwrapped
+    env.reset()
+    returns = branch_rollouts(env, np.zeros((4, 5)), noise=np.ones(5))
+    assert np.all(returns == returns[0])
+    # a reused batch gets its own generator back
+    batch = BatchEcologyEnv(env, n_envs=4)
+    rng = batch.rng
+    branch_rollouts(batch, np.zeros((4, 5)), env.get_snapshot(), noise=[1.0])
+    assert batch.rng is rng and batch.autoreset
+
+
+def test_mpc():
+    env = gym.make("conservation-v5", Tmax=30, file=None)
+    model = mpc(env, horizon=10, n_samples=100, seed=0)
+    mean, _ = evaluate(model, env, n_eval_episodes=1, cache=False)
+    assert model.plan.shape == (10,)
+    # each episode starts from a fresh plan
+    model = mpc(env, horizon=10, n_samples=100, seed=0)
+    first, _ = model.predict(env.reset())
+    evaluate(model, env, n_eval_episodes=1, cache=False)
+    model.rng = np.random.default_rng(0)
+    assert model.predict(env.reset())[0] == first
+    assert mean >= rollout_policy(env, target_a(env, 0.18))[0]
+    model = mpc(env, horizon=10, method="shooting", seed=0)
+    action, _ = model.predict(env.reset())
+    assert -1 <= action <= 1
+    # the default search beats the constant-escapement rule
+    env = gym.make("conservation-v5", Tmax=100, file=None)
+    mean, _ = evaluate(mpc(env, seed=0), env, n_eval_episodes=1, cache=False)
+    assert mean >= rollout_policy(env, target_a(env, 0.18))[0]
+
+
+def test_evaluate_sequential():
+    env = gym.make("conservation-v5", file=None)
+    policies = {"a": target_a(env, 0.18), "b": target_state(env, 0.8)}
+    df = evaluate_sequential(env.unwrapped, policies, batch_size=5, seed=0)
+    # deterministic: one batch settles everything
+    assert list(df.episodes) == [5, 5]
+    assert list(df.status) == ["precise", "dominated"]
+    assert np.isclose(df["mean"][0], rollout_policy(env, policies["a"])[0])
+
+    env = gym.make("conservation-v6", file=None)
+    df = evaluate_sequential(
+        env.unwrapped, fixed_action(env, 0.2), rtol=0.05, seed=0
+    )
+    assert df.status[0] == "precise" and df.episodes[0] < 1000
+    assert df["high"][0] - df["mean"][0] <= 0.05 * df["mean"][0]
+
+    # a leader that is already precise stays the comparator of the rest
+    env = gym.make("conservation-v5", Tmax=50, file=None)
+    policies = {"a": fixed_action(env, 0.5), "b": noisy_action(env, 0.5)}
+    df = evaluate_sequential(
+        env.unwrapped, policies, 5, max_episodes=500, rtol=1e-4, seed=0
+    )
+    assert list(df.status) == ["precise", "dominated"]
+    assert df.episodes[1] < 500
+    with pytest.raises(ValueError):
+        evaluate_sequential(env.unwrapped, policies, 2, antithetic=True)
+
+    # tied policies are not told apart by repeated looks
+    env = gym.make("conservation-v5", Tmax=20, file=None)
+    policies = {"a": noisy_action(env, 0.3), "b": noisy_action(env, 0.3)}
+    for i, policy in enumerate(policies.values()):
+        policy.rng = np.random.default_rng(i)
+    df = evaluate_sequential(
+        env.unwrapped, policies, 5, max_episodes=200, rtol=1e-6, seed=0
+    )
+    assert list(df.status) == ["max_episodes", "max_episodes"]
+    assert np.isclose(_t_ppf(0.975, 4), 2.7764, atol=1e-4)
+
+
+class noisy_action(fixed_action):
+    """
+    fixed_action plus independent noise, a policy that is not
+    deterministic
+    """
+
+    rng = np.random.default_rng(0)
+
+    def batch_action(self, unscaled_state, params):
+        action = super().batch_action(unscaled_state, params)
+        return np.abs(action + self.rng.normal(0, 0.05, np.shape(action)))